@@ -0,0 +1,57 @@
+"""
+Compares build time and peak memory of the Diagram and CompactDiagram backends.
+
+Every measurement runs in a fresh interpreter so that peak RSS is not shared between runs.
+
+Usage: python benchmarks/bench_backends.py [instances ...]
+"""
+import json
+import subprocess
+import sys
+
+RUN = """
+import json, os, resource, sys
+from time import perf_counter
+import py2drawio
+
+backend = getattr(py2drawio, sys.argv[1])
+instances = int(sys.argv[2])
+start = perf_counter()
+diagram = backend()
+vpc = diagram.add_node('vpc', 'VPC', 'VPC')
+subnets = [diagram.add_node(f'subnet_{i}', 'PrivateSubnet', f'Subnet {i}', parent=vpc) for i in range(max(1, instances // 100))]
+nodes = [diagram.add_node(f'instance_{i}', 'EC2Instance', f'Instance {i}', parent=subnets[i % len(subnets)]) for i in range(instances)]
+for i in range(1, instances):
+    diagram.add_edge(nodes[i - 1], nodes[i])
+build = perf_counter() - start
+diagram.compose_all()
+layout = perf_counter() - start - build
+build_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+with open(os.devnull, 'wb') as out:
+    diagram.write(out)
+write = perf_counter() - start - build - layout
+print(json.dumps({
+    'build': build,
+    'layout': layout,
+    'write': write,
+    'build_rss': build_rss,
+    'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}))
+"""
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or [10000, 100000]
+    print(f"{'backend':<15} {'instances':>9} {'build (s)':>10} {'layout (s)':>11} {'write (s)':>10} {'RSS before write (MB)':>22} {'peak RSS (MB)':>14}")
+    for instances in sizes:
+        for backend in ('Diagram', 'CompactDiagram'):
+            output = subprocess.run([sys.executable, '-c', RUN, backend, str(instances)], check=True, capture_output=True, text=True).stdout
+            result = json.loads(output)
+            print(
+                f"{backend:<15} {instances:>9} {result['build']:>10.2f} {result['layout']:>11.2f} {result['write']:>10.2f}"
+                f" {result['build_rss'] / 1024:>22.0f} {result['peak_rss'] / 1024:>14.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Measures the throughput of render_many for an increasing number of workers.
+
+Usage: python benchmarks/bench_batch.py [diagrams] [instances]
+"""
+import os
+import sys
+from time import perf_counter
+
+from py2drawio.batch import render_many
+
+
+def spec(number: int, instances: int):
+    subnets = max(1, instances // 100)
+    nodes = [('vpc', 'VPC', 'VPC')]
+    nodes += [(f'subnet_{i}', 'PrivateSubnet', f'Subnet {i}', None, None, 0, 'vpc') for i in range(subnets)]
+    nodes += [(f'instance_{i}', 'EC2Instance', f'Instance {i}', None, None, 0, f'subnet_{i % subnets}') for i in range(instances)]
+    edges = [(f'instance_{i - 1}', f'instance_{i}') for i in range(1, instances)]
+    return {'name': f'diagram_{number}', 'nodes': nodes, 'edges': edges, 'compressed': True}
+
+
+def main():
+    diagrams = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    instances = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    specs = [spec(number, instances) for number in range(diagrams)]
+    print(f"{'workers':>8} {'seconds':>8} {'diagrams/s':>11} {'speedup':>8}")
+    baseline = None
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        start = perf_counter()
+        results = list(render_many(specs, workers=workers))
+        seconds = perf_counter() - start
+        assert all(result.error is None for result in results)
+        baseline = baseline or seconds
+        print(f"{workers:>8} {seconds:>8.2f} {diagrams / seconds:>11.1f} {baseline / seconds:>8.2f}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
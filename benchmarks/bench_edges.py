@@ -0,0 +1,57 @@
+"""
+Measures edge lookups and the size and write time of edge-heavy diagrams before and after aggregate_edges.
+
+Usage: python benchmarks/bench_edges.py [instances] [edges per instance]
+"""
+import io
+import sys
+from time import perf_counter
+
+from topology import generate
+
+from py2drawio import Diagram
+
+SUBNETS = ['PublicSubnet', 'PrivateSubnet']
+
+
+def build(topology):
+    diagram = Diagram()
+    diagram.add_nodes([(node_id, node_type, node_name, None, None, 0, parent) for node_id, node_type, node_name, parent in topology.nodes])
+    diagram.add_edges(topology.edges)
+    diagram.compose_all()
+    return diagram
+
+
+def write(diagram):
+    out = io.BytesIO()
+    start = perf_counter()
+    diagram.write(out)
+    return perf_counter() - start, len(out.getvalue())
+
+
+def main():
+    instances = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    density = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    topology = generate(vpcs=2, azs=3, subnets=4, instances=max(1, instances // 24), edge_density=density)
+    diagram = build(topology)
+    leaves = [node_id for node_id, node_type, _, _ in topology.nodes if node_type == 'EC2Instance']
+    start = perf_counter()
+    attached = sum(len(diagram.edges_of(node_id)) for node_id in leaves)
+    lookup = perf_counter() - start
+    print(f"{len(leaves)} instances, {len(topology.edges)} edges")
+    print(f"edges_of on every instance: {lookup * 1000:.1f} ms ({attached} edges)")
+    print(f"{'mode':<28} {'edges':>8} {'aggregate (ms)':>15} {'write (ms)':>11} {'size (bytes)':>14}")
+    elapsed, size = write(diagram)
+    print(f"{'none':<28} {len(topology.edges):>8} {'':>15} {elapsed * 1000:>11.1f} {size:>14}")
+    for name, types in (("parallel", None), ("subnets", SUBNETS), ("VPCs", ['VPC'])):
+        diagram = build(topology)
+        start = perf_counter()
+        diagram.aggregate_edges(types)
+        aggregated = perf_counter() - start
+        edges = sum(len(edges) for edges in diagram.page.outgoing.values())
+        elapsed, size = write(diagram)
+        print(f"{name:<28} {edges:>8} {aggregated * 1000:>15.1f} {elapsed * 1000:>11.1f} {size:>14}")
+
+
+if __name__ == "__main__":
+    main()
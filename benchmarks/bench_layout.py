@@ -0,0 +1,38 @@
+"""
+Compares the pure python and numpy placement paths of grid_layout.
+
+Usage: python benchmarks/bench_layout.py
+"""
+import random
+from timeit import timeit
+
+from py2drawio.layout import HAS_NUMPY, grid_layout
+
+MODES = {
+    "grid": {},
+    "hpack": {"hpack": True},
+    "vpack": {"vpack": True},
+}
+
+
+def main():
+    if not HAS_NUMPY:
+        raise SystemExit("numpy is not installed")
+    print(f"{'children':>9} {'mode':>6} {'python (ms)':>12} {'numpy (ms)':>11} {'speedup':>8}")
+    for count in (1000, 10000, 100000):
+        widths = [random.randint(30, 130) for _ in range(count)]
+        heights = [random.randint(30, 130) for _ in range(count)]
+        for mode, options in MODES.items():
+            python_result = grid_layout(widths, heights, 130, 130, vectorize=False, **options)
+            numpy_result = grid_layout(widths, heights, 130, 130, vectorize=True, **options)
+            assert [str(x) for x in python_result[2]] == [str(x) for x in numpy_result[2]]
+            assert [str(y) for y in python_result[3]] == [str(y) for y in numpy_result[3]]
+            assert python_result[:2] == numpy_result[:2]
+            number = max(1, 100000 // count)
+            python_time = timeit(lambda: grid_layout(widths, heights, 130, 130, vectorize=False, **options), number=number) / number
+            numpy_time = timeit(lambda: grid_layout(widths, heights, 130, 130, vectorize=True, **options), number=number) / number
+            print(f"{count:>9} {mode:>6} {python_time * 1000:>12.2f} {numpy_time * 1000:>11.2f} {python_time / numpy_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Compares rendering diagrams through a warm render server against starting a Python process per diagram.
+
+Usage: python benchmarks/bench_server.py [requests] [concurrency] [workers]
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+from py2drawio.server import RenderServer
+
+SPEC = {
+    'nodes': [('vpc', 'VPC', 'VPC')]
+    + [(f'subnet_{s}', 'PrivateSubnet', f'Subnet {s}', None, None, 0, 'vpc') for s in range(4)]
+    + [(f'instance_{i}', 'EC2Instance', f'Instance {i}', None, None, 0, f'subnet_{i % 4}') for i in range(40)],
+    'edges': [(f'instance_{i}', f'instance_{i + 1}') for i in range(39)],
+    'layout': {'VPC': {'vpack': True}},
+}
+
+
+async def post(address, body: bytes):
+    if isinstance(address, str):
+        reader, writer = await asyncio.open_unix_connection(address)
+    else:
+        reader, writer = await asyncio.open_connection(*address[:2])
+    writer.write(f"POST /render HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b" ", 2)[1])
+
+
+async def get(address, target: str):
+    reader, writer = await asyncio.open_connection(*address[:2])
+    writer.write(f"GET {target} HTTP/1.1\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+
+async def run(requests: int, concurrency: int, workers: int, socket_path: str):
+    body = json.dumps(SPEC).encode()
+    results = {}
+    for name, options in (("tcp", {'port': 0}), ("unix socket", {'path': socket_path})):
+        server = RenderServer(workers=workers, max_queue=requests)
+        address = await server.start(**options)
+        await post(address, body)
+        limit = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with limit:
+                return await post(address, body)
+
+        start = perf_counter()
+        statuses = await asyncio.gather(*[one() for _ in range(requests)])
+        elapsed = perf_counter() - start
+        if name == "tcp":
+            metrics = await get(address, "/metrics")
+        await server.close()
+        assert all(status == 200 for status in statuses), statuses
+        results[name] = elapsed
+    return results, metrics
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else (os.cpu_count() or 1)
+    with tempfile.TemporaryDirectory() as directory:
+        spec_file = os.path.join(directory, "spec.json")
+        with open(spec_file, "w") as f:
+            json.dump(SPEC, f)
+        processes = 5
+        start = perf_counter()
+        for _ in range(processes):
+            subprocess.run([sys.executable, "-m", "py2drawio", "build", "--no-cache", spec_file], check=True, stdout=subprocess.DEVNULL)
+        per_process = (perf_counter() - start) / processes
+        loop = asyncio.new_event_loop()
+        results, metrics = loop.run_until_complete(run(requests, concurrency, workers, os.path.join(directory, "render.sock")))
+        loop.close()
+    print(f"{requests} requests, concurrency {concurrency}, {workers} workers")
+    print(f"{'process per diagram':<22} {per_process * 1000:>8.1f} ms per diagram")
+    for name, elapsed in results.items():
+        print(f"{name:<22} {elapsed / requests * 1000:>8.1f} ms per diagram, {requests / elapsed:>7.1f} diagrams/s")
+    latency = metrics['latency']
+    print(f"server latency (tcp): p50 {latency['p50'] * 1000:.1f} ms, p95 {latency['p95'] * 1000:.1f} ms, p99 {latency['p99'] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
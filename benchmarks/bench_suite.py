@@ -0,0 +1,194 @@
+"""
+Measures how every phase of a diagram build scales over synthetic AWS topologies, see topology.py.
+
+Topologies are swept one dimension at a time around a base topology: VPCs, availability zones, subnets, instances, nesting depth and edge density. Every phase is timed over several runs, keeping the fastest, then run again under tracemalloc to measure its peak memory. Phases are add_node, add_edge, compose_children (every container, innermost first), compose_parents (every container type, innermost first), compose_all, write and write_compressed. Allocations are the net number of memory blocks allocated by a phase.
+
+Results are saved as JSON, and can be compared with the results of an earlier run.
+
+Usage: python benchmarks/bench_suite.py [--quick] [--repeat 3] [--backend Diagram|CompactDiagram] [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tracemalloc
+from datetime import datetime, timezone
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import py2drawio
+from topology import generate
+
+BASE = {'vpcs': 2, 'azs': 3, 'subnets': 2, 'instances': 50, 'depth': 0, 'edge_density': 1.0}
+SWEEP = {
+    'vpcs': [1, 4, 16],
+    'azs': [1, 3, 6],
+    'subnets': [2, 4, 8],
+    'instances': [10, 100, 500],
+    'depth': [0, 2, 4],
+    'edge_density': [0.0, 1.0, 4.0],
+}
+QUICK_SWEEP = {
+    'instances': [10, 100],
+    'depth': [0, 2],
+    'edge_density': [0.0, 2.0],
+}
+
+
+def configs(sweep: dict):
+    """
+    Yields the base topology followed by one topology per swept value
+    """
+    yield dict(BASE)
+    for dimension, values in sweep.items():
+        for value in values:
+            if value != BASE[dimension]:
+                yield dict(BASE, **{dimension: value})
+
+
+def phases(backend, topology):
+    """
+    Yields the name of every phase of a build, after running it
+    """
+    diagram = backend()
+    nodes = {}
+    for node_id, node_type, node_name, parent_id in topology.nodes:
+        nodes[node_id] = diagram.add_node(node_id, node_type, node_name, parent=nodes.get(parent_id))
+    yield 'add_node'
+    for source_id, target_id in topology.edges:
+        diagram.add_edge(nodes[source_id], nodes[target_id])
+    yield 'add_edge'
+    for level in reversed(topology.containers):
+        for container_id in level:
+            diagram.compose_children(nodes[container_id])
+    yield 'compose_children'
+    types = []
+    for level in reversed(topology.containers):
+        for container_id in level:
+            node_type = nodes[container_id].attrib.get('type')
+            if node_type not in types:
+                types.append(node_type)
+    for node_type in types:
+        diagram.compose_parents([node_type])
+    yield 'compose_parents'
+    diagram.compose_all()
+    yield 'compose_all'
+    with open(os.devnull, 'wb') as out:
+        diagram.write(out)
+    yield 'write'
+    with open(os.devnull, 'wb') as out:
+        diagram.write(out, compressed=True)
+    yield 'write_compressed'
+
+
+def measure(backend, topology, repeat: int = 3):
+    """
+    Runs every phase of a build repeatedly, returning the best wall time, allocated blocks and peak memory of each phase
+    """
+    results = {}
+    for _ in range(repeat):
+        gc.collect()
+        start = perf_counter()
+        blocks = sys.getallocatedblocks()
+        for phase in phases(backend, topology):
+            end = perf_counter()
+            end_blocks = sys.getallocatedblocks()
+            result = results.setdefault(phase, {'seconds': end - start, 'blocks': end_blocks - blocks})
+            result['seconds'] = min(result['seconds'], end - start)
+            start = perf_counter()
+            blocks = sys.getallocatedblocks()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for phase in phases(backend, topology):
+            results[phase]['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            else:
+                # reset_peak is new in python 3.9, restarting tracing also resets the peak
+                tracemalloc.stop()
+                tracemalloc.start()
+    finally:
+        tracemalloc.stop()
+    return results
+
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'date': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+    }
+
+
+def compare(results: list, baseline_file: str):
+    """
+    Prints the ratio of the wall time and peak memory of every phase to those of an earlier run, for the topologies both runs measured
+    """
+    with open(baseline_file) as f:
+        baseline = {json.dumps(result['config'], sort_keys=True): result for result in json.load(f)['results']}
+    print(f"\n{'config':<40} {'phase':<17} {'time':>7} {'memory':>7}")
+    for result in results:
+        key = json.dumps(result['config'], sort_keys=True)
+        if key not in baseline:
+            continue
+        for phase, measured in result['phases'].items():
+            before = baseline[key]['phases'].get(phase)
+            if before is None:
+                continue
+            time_ratio = measured['seconds'] / before['seconds'] if before['seconds'] else float('nan')
+            memory_ratio = measured['peak_bytes'] / before['peak_bytes'] if before['peak_bytes'] else float('nan')
+            print(f"{label(result['config']):<40} {phase:<17} {time_ratio:>6.2f}x {memory_ratio:>6.2f}x")
+
+
+def label(config: dict):
+    return " ".join(f"{key}={value}" for key, value in config.items() if value != BASE[key]) or "base"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--quick', action='store_true', help="sweep fewer topologies")
+    parser.add_argument('--repeat', type=int, default=3, help="the number of timed runs of every topology")
+    parser.add_argument('--backend', default='Diagram', choices=['Diagram', 'CompactDiagram'])
+    parser.add_argument('--output', default='benchmark-results.json', help="the JSON file the results are saved to")
+    parser.add_argument('--compare', help="the JSON results of an earlier run to compare with")
+    args = parser.parse_args()
+    backend = getattr(py2drawio, args.backend)
+
+    results = []
+    print(f"{'config':<40} {'nodes':>7} {'edges':>7} {'phase':<17} {'seconds':>8} {'blocks':>9} {'peak (MB)':>10}")
+    for config in configs(QUICK_SWEEP if args.quick else SWEEP):
+        topology = generate(**config)
+        measured = measure(backend, topology, args.repeat)
+        results.append({
+            'config': config,
+            'backend': args.backend,
+            'repeat': args.repeat,
+            'nodes': len(topology.nodes),
+            'edges': len(topology.edges),
+            'phases': measured,
+        })
+        for phase, result in measured.items():
+            print(
+                f"{label(config):<40} {len(topology.nodes):>7} {len(topology.edges):>7} {phase:<17}"
+                f" {result['seconds']:>8.4f} {result['blocks']:>9} {result['peak_bytes'] / 2 ** 20:>10.2f}"
+            )
+
+    with open(args.output, 'w') as f:
+        json.dump({'meta': metadata(), 'results': results}, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Compares the size and speed of the Diagram.write output modes against a plain ElementTree dump.
+
+Usage: python benchmarks/bench_write.py [instances]
+"""
+import io
+import sys
+import xml.etree.ElementTree as ET
+from time import perf_counter
+
+from py2drawio import Diagram
+
+
+def build(instances: int):
+    diagram = Diagram()
+    vpc = diagram.add_node('vpc', 'VPC', 'VPC')
+    subnets = [diagram.add_node(f'subnet_{i}', 'PrivateSubnet', f'Subnet {i}', parent=vpc) for i in range(max(1, instances // 100))]
+    for i in range(instances):
+        diagram.add_node(f'instance_{i}', 'EC2Instance', f'Instance {i}', parent=subnets[i % len(subnets)])
+    diagram.compose_all()
+    return diagram
+
+
+def measure(write):
+    out = io.BytesIO()
+    start = perf_counter()
+    write(out)
+    return perf_counter() - start, len(out.getvalue())
+
+
+def main():
+    instances = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    diagram = build(instances)
+    modes = {
+        "ElementTree.write": lambda out: ET.ElementTree(diagram.root).write(out),
+        "write()": lambda out: diagram.write(out),
+        "write(compressed=True)": lambda out: diagram.write(out, compressed=True),
+        "write(gzip=True)": lambda out: diagram.write(out, gzip=True),
+        "write(compressed=True, gzip=True)": lambda out: diagram.write(out, compressed=True, gzip=True),
+    }
+    print(f"{instances} instances")
+    print(f"{'mode':<36} {'time (ms)':>10} {'size (bytes)':>14}")
+    for name, write in modes.items():
+        elapsed, size = measure(write)
+        print(f"{name:<36} {elapsed * 1000:>10.1f} {size:>14}")
+
+
+if __name__ == "__main__":
+    main()
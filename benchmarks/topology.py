@@ -0,0 +1,90 @@
+"""
+Generates synthetic AWS topologies shaped like example.py, for the benchmarks.
+
+Every VPC holds one BlankContainer per availability zone, every zone holds public and private subnets, and every subnet holds EC2 instances. Instances can be wrapped in further levels of BlankContainer to deepen the nesting, and random edges are drawn between instances.
+"""
+import random
+from collections import namedtuple
+
+Topology = namedtuple('Topology', ['nodes', 'edges', 'containers'])
+Topology.__doc__ = """
+A generated topology
+
+Attributes
+----------
+nodes : list of tuple
+    (node_id, node_type, node_name, parent_id) of every node, parents first. parent_id is None for VPCs.
+edges : list of tuple
+    (source_id, target_id) of every edge
+containers : list of list of str
+    The IDs of the containers by nesting depth, outermost first
+"""
+
+
+def generate(vpcs: int = 1, azs: int = 3, subnets: int = 2, instances: int = 10, depth: int = 0, edge_density: float = 1.0, seed: int = 0):
+    """
+    Generates a topology
+
+    Parameters
+    ----------
+    vpcs : int
+        The number of VPCs
+    azs : int
+        The number of availability zones per VPC
+    subnets : int
+        The number of subnets per availability zone, alternately public and private
+    instances : int
+        The number of instances per subnet
+    depth : int
+        The number of BlankContainer levels between a subnet and its instances. Each level splits its contents in two.
+    edge_density : float
+        The number of edges per instance. Edges join random distinct instances.
+    seed : int
+        The seed of the random edges
+
+    Returns
+    -------
+    topology : Topology
+        The generated topology
+    """
+    nodes = []
+    containers = [[] for _ in range(3 + depth)]
+    leaves = []
+    for v in range(vpcs):
+        vpc = f'vpc{v}'
+        nodes.append((vpc, 'VPC', f'VPC {v}', None))
+        containers[0].append(vpc)
+        for a in range(azs):
+            az = f'{vpc}_az{a}'
+            nodes.append((az, 'BlankContainer', f'AZ {a}', vpc))
+            containers[1].append(az)
+            for s in range(subnets):
+                subnet = f'{az}_subnet{s}'
+                kind = 'PublicSubnet' if s % 2 == 0 else 'PrivateSubnet'
+                nodes.append((subnet, kind, f'{kind} {s}', az))
+                containers[2].append(subnet)
+                parents = [subnet]
+                for level in range(depth):
+                    groups = []
+                    for parent in parents:
+                        for g in range(2):
+                            group = f'{parent}_g{g}'
+                            nodes.append((group, 'BlankContainer', f'Group {g}', parent))
+                            containers[3 + level].append(group)
+                            groups.append(group)
+                    parents = groups
+                for i in range(instances):
+                    instance = f'{subnet}_i{i}'
+                    nodes.append((instance, 'EC2Instance', f'Instance {i}', parents[i % len(parents)]))
+                    leaves.append(instance)
+    edges = []
+    if len(leaves) > 1:
+        rng = random.Random(seed)
+        seen = set()
+        wanted = min(int(len(leaves) * edge_density), len(leaves) * (len(leaves) - 1))
+        while len(edges) < wanted:
+            edge = tuple(rng.sample(leaves, 2))
+            if edge not in seen:
+                seen.add(edge)
+                edges.append(edge)
+    return Topology(nodes, edges, containers)
@@ -41,15 +41,14 @@ rds_instance = diagram.add_node('rds_instance',  'RDSInstance', 'rds_instance',
 for az, web_server in web_servers.items():
     diagram.add_edge(web_server, reverse_proxy)
 
-# Compose the parent containers in reverse order
-
-for az, subnet in public_subnets.items():
-    diagram.compose_children(subnet, orientation='portrait')
-for az, subnet in private_subnets.items():
-    diagram.compose_children(subnet, orientation='portrait')
-diagram.compose_children(public_subnet_container, width = len(public_subnets), text_padding = 20)
-diagram.compose_children(private_subnet_container, width = len(private_subnets), text_padding = 20)
-diagram.compose_children(vpc, vpack=True, text_padding = 10, cell_padding = 0)
+# Compose all the containers in a single pass, innermost first
+
+diagram.compose_all({
+    'PublicSubnet': {'orientation': 'portrait'},
+    'PrivateSubnet': {'orientation': 'portrait'},
+    'BlankContainer': {'width': len(availability_zones), 'text_padding': 20},
+    'VPC': {'vpack': True, 'text_padding': 10, 'cell_padding': 0},
+})
 
 # Write the diagram to a file
 diagram.write('testout.drawio')
\ No newline at end of file
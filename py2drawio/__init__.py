@@ -1 +1,7 @@
-from .diagram import Diagram
\ No newline at end of file
+__version__ = '0.1'
+
+from .diagram import Diagram, BatchError
+from .compact import CompactDiagram
+from .batch import render_many
+from .instrument import Stats
+from .cache import build_cached
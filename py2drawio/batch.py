@@ -0,0 +1,178 @@
+import os
+import traceback
+from collections import namedtuple
+from io import BytesIO
+from time import perf_counter
+from .compact import CompactDiagram
+from .diagram import Diagram
+from .templates import load_template
+
+SPEC_FIELDS = ('name', 'template', 'compact', 'nodes', 'edges', 'aggregate', 'layout', 'compose', 'output', 'compressed', 'gzip')
+
+RenderResult = namedtuple('RenderResult', ['index', 'name', 'output', 'data', 'error', 'seconds'])
+RenderResult.__doc__ = """
+The outcome of rendering one diagram spec
+
+Attributes
+----------
+index : int
+    The position of the spec in the batch
+name : str or None
+    The name given in the spec
+output : str or None
+    The filename the diagram was written to, if the spec had an output
+data : bytes or None
+    The content of the draw.io file, if the spec had no output
+error : str or None
+    The traceback of the failure if the diagram could not be rendered, None on success
+seconds : float
+    The time spent rendering the diagram
+"""
+
+
+def build(spec: dict, layouts: dict = None):
+    """
+    Builds and lays out a diagram from a declarative spec
+
+    Parameters
+    ----------
+    spec : dict
+        The diagram spec, with the following optional keys:
+
+        - name: a name for the diagram, reported back in results
+        - template: the filename of the template file to be used, or an already loaded template
+        - compact: if true, the diagram is built with CompactDiagram. Default False
+        - nodes: the nodes of the diagram, in any format accepted by Diagram.add_nodes
+        - edges: the edges of the diagram, in any format accepted by Diagram.add_edges
+        - aggregate: Diagram.aggregate_edges keyword arguments, or true to collapse parallel edges only
+        - layout: layout options per node type or node ID, as accepted by Diagram.compose_all
+        - compose: compose_all keyword arguments applied to every container, or false to leave the diagram unlaid out
+        - output, compressed, gzip: where and how the diagram is written by render
+    layouts : dict, optional
+        Laid out subtrees reused and updated by compose_all, see Diagram.compose_all
+
+    Returns
+    -------
+    diagram : Diagram
+        The laid out diagram
+    """
+    unknown = spec.keys() - set(SPEC_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown spec fields {', '.join(sorted(unknown))}")
+    backend = CompactDiagram if spec.get('compact') else Diagram
+    diagram = backend(template=spec.get('template'))
+    diagram.add_nodes(spec.get('nodes', []))
+    diagram.add_edges(spec.get('edges', []))
+    aggregate = spec.get('aggregate')
+    if aggregate:
+        diagram.aggregate_edges(**(aggregate if isinstance(aggregate, dict) else {}))
+    compose = spec.get('compose', {})
+    if compose is not False:
+        diagram.compose_all(spec.get('layout'), layouts=layouts, **(compose or {}))
+    return diagram
+
+
+def render(spec: dict, index: int = 0):
+    """
+    Builds, lays out and writes a diagram from a declarative spec, capturing any failure
+
+    Parameters
+    ----------
+    spec : dict
+        The diagram spec, see build. If it has an output, the diagram is written to that file, otherwise the content of the file is returned.
+    index : int, optional
+        The position of the spec in its batch, reported back in the result. Default 0
+
+    Returns
+    -------
+    result : RenderResult
+        The outcome of the render
+    """
+    start = perf_counter()
+    name = output = data = error = None
+    try:
+        name = spec.get('name')
+        output = spec.get('output')
+        diagram = build(spec)
+        target = output if output is not None else BytesIO()
+        diagram.write(target, compressed=spec.get('compressed', False), gzip=spec.get('gzip', False))
+        if output is None:
+            data = target.getvalue()
+    except Exception:
+        output = data = None
+        error = traceback.format_exc()
+    return RenderResult(index, name, output, data, error, perf_counter() - start)
+
+
+def _warm(templates: list):
+    """
+    Loads templates in a worker process before its first render, so they are parsed once per worker
+    """
+    for template in templates:
+        try:
+            load_template(template)
+        except Exception:
+            # the failure is reported by the renders that use the template
+            pass
+
+
+def render_many(specs, workers: int = None, templates: list = None, ordered: bool = False):
+    """
+    Renders many diagram specs over a pool of worker processes
+
+    Results are yielded as each render finishes, and a spec that fails is reported in its result without aborting the batch. Specs are consumed lazily, with at most two specs per worker in flight, so specs can be streamed from a generator. Templates are parsed at most once per worker.
+
+    Parameters
+    ----------
+    specs : iterable of dict
+        The diagram specs to be rendered, see build and render
+    workers : int, optional
+        The number of worker processes. If not specified, one worker per CPU is used. With 1 worker, specs are rendered in the calling process.
+    templates : list of str, optional
+        Template filenames loaded by every worker on start up, in addition to the default template
+    ordered : bool, optional
+        If true, results are yielded in the order of the specs instead of as they finish. Default False
+
+    Yields
+    ------
+    result : RenderResult
+        The outcome of each render
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        for index, spec in enumerate(specs):
+            yield render(spec, index)
+        return
+    # imported here so that importing py2drawio does not load multiprocessing
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    specs = enumerate(specs)
+    # maps the futures of the renders in flight to the index and name of their spec
+    pending = {}
+    done = {}
+    next_index = 0
+    with ProcessPoolExecutor(workers, initializer=_warm, initargs=([None] + list(templates or []),)) as pool:
+        while True:
+            for index, spec in specs:
+                # malformed specs are reported by render, in their result
+                name = spec.get('name') if isinstance(spec, dict) else None
+                pending[pool.submit(render, spec, index)] = (index, name)
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                index, name = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception:
+                    # the spec could not be sent to a worker, or the worker died
+                    result = RenderResult(index, name, None, None, traceback.format_exc(), 0.0)
+                if not ordered:
+                    yield result
+                    continue
+                done[result.index] = result
+                while next_index in done:
+                    yield done.pop(next_index)
+                    next_index += 1
@@ -0,0 +1,163 @@
+import json
+import os
+from collections import namedtuple
+from hashlib import sha256
+from io import BytesIO
+from os.path import dirname, realpath
+from . import __version__
+from .batch import build
+from .templates import DEFAULT_TEMPLATE, cache_dir, invalidate_cache
+
+# Spec fields that do not change the content of the built file
+UNKEYED_FIELDS = ('name', 'output')
+
+CachedBuild = namedtuple('CachedBuild', ['key', 'output', 'data', 'hit'])
+CachedBuild.__doc__ = """
+The outcome of build_cached
+
+Attributes
+----------
+key : str
+    The content address of the build
+output : str or None
+    The filename the diagram was written to, if any
+data : bytes
+    The content of the draw.io file
+hit : bool
+    True if the file was taken from the cache, False if the diagram was built
+"""
+
+
+class _Layouts(dict):
+    """
+    The layout memo of a build. Lookups fall back to the subtrees of the previous build, and only the subtrees used by this build are kept.
+    """
+    def __init__(self, previous: dict):
+        super().__init__()
+        self.previous = previous
+
+    def get(self, key, default=None):
+        entry = super().get(key)
+        if entry is None:
+            entry = self.previous.get(key, default)
+        return entry
+
+
+def _digest(data: bytes):
+    return sha256(data).hexdigest()
+
+
+def spec_key(spec: dict):
+    """
+    Computes the content address of a diagram spec
+
+    The address covers the spec, except its name and output, the content of its template file, or of the default template, and the version of py2drawio. Renaming or moving a template does not change the address, editing it does.
+
+    Parameters
+    ----------
+    spec : dict
+        The diagram spec, see py2drawio.batch.build
+
+    Returns
+    -------
+    key : str
+        The hexadecimal SHA-256 digest of the spec
+    """
+    content = {field: value for field, value in spec.items() if field not in UNKEYED_FIELDS}
+    template = spec.get('template')
+    if not isinstance(template, dict):
+        with open(realpath(template if template is not None else DEFAULT_TEMPLATE), 'rb') as f:
+            content['template'] = _digest(f.read())
+    payload = json.dumps({'version': __version__, 'spec': content}, sort_keys=True, separators=(',', ':'), default=str)
+    return _digest(payload.encode())
+
+
+def _read(path: str, mode: str = 'rb'):
+    try:
+        with open(path, mode) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _write(path: str, data):
+    """
+    Atomically replaces a cache file. Failures are ignored, the cache is only an optimisation.
+    """
+    try:
+        os.makedirs(dirname(path), exist_ok=True)
+        temp_file = f"{path}.{os.getpid()}.tmp"
+        with open(temp_file, 'wb' if isinstance(data, bytes) else 'w') as f:
+            f.write(data)
+        os.replace(temp_file, path)
+    except OSError:
+        pass
+
+
+def build_cached(spec: dict, output: str = None, disk_cache: bool = True):
+    """
+    Builds, lays out and writes a diagram from a declarative spec, reusing earlier builds of the same content
+
+    Built files are stored in a content-addressed cache, see spec_key, and an unchanged spec is copied from the cache without being built. When a spec with an output or a name changes, the subtrees laid out by its previous build are reused for every container whose contents and options did not change.
+
+    Parameters
+    ----------
+    spec : dict
+        The diagram spec, see py2drawio.batch.build
+    output : str, optional
+        The filename of the draw.io file to be written. If not specified, the output of the spec is used, and if the spec has none, no file is written.
+    disk_cache : bool, optional
+        If false, the cache is neither read nor written. Default True
+
+    Returns
+    -------
+    result : CachedBuild
+        The key, output and content of the build, and whether it was taken from the cache
+    """
+    key = spec_key(spec)
+    if output is None:
+        output = spec.get('output')
+    path = cache_dir("builds", key[:2], f"{key}.drawio")
+    data = _read(path) if disk_cache else None
+    hit = data is not None
+    if not hit:
+        # the layouts of the previous build of the same output, or of the same name
+        lineage = realpath(output) if output is not None else spec.get('name')
+        layouts_file = None
+        layouts = None
+        if disk_cache and lineage is not None:
+            layouts_file = cache_dir("layouts", f"{_digest(str(lineage).encode())[:32]}.json")
+            try:
+                layouts = _Layouts(json.loads(_read(layouts_file, 'r') or '{}'))
+            except ValueError:
+                layouts = _Layouts({})
+        diagram = build(spec, layouts)
+        out = BytesIO()
+        diagram.write(out, compressed=spec.get('compressed', False), gzip=spec.get('gzip', False))
+        data = out.getvalue()
+        if disk_cache:
+            _write(path, data)
+            if layouts_file is not None:
+                _write(layouts_file, json.dumps(layouts, separators=(',', ':')))
+    if output is not None:
+        with open(output, 'wb') as f:
+            f.write(data)
+    return CachedBuild(key, output, data, hit)
+
+
+def clear_cache():
+    """
+    Drops every cached build, layout and parsed template from the on-disk cache, and the parsed templates of the process
+
+    Returns
+    -------
+    None
+    """
+    invalidate_cache()
+    for kind in ("builds", "layouts"):
+        for directory, _, files in os.walk(cache_dir(kind)):
+            for name in files:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
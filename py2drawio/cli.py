@@ -0,0 +1,107 @@
+"""
+Command line interface of py2drawio
+
+Usage:
+    py2drawio [--cache-dir DIR] build SPEC [SPEC ...] [-o OUTPUT] [--no-cache] [--cache-dir DIR]
+    py2drawio [--cache-dir DIR] clear-cache [--cache-dir DIR]
+    py2drawio serve [--host HOST] [--port PORT | --socket PATH] [--workers N] [--max-concurrent N] [--max-queue N] [--template FILE ...]
+"""
+import argparse
+import os
+import sys
+from os.path import dirname, isabs, join, splitext
+from time import perf_counter
+from .cache import build_cached, clear_cache
+
+
+def load_spec(path: str):
+    """
+    Loads a diagram spec from a yaml or JSON file
+
+    Relative template and output filenames in the spec are resolved against the directory of the spec file. If the spec has no output, the diagram is written next to the spec file, with the .drawio extension.
+
+    Parameters
+    ----------
+    path : str
+        The filename of the spec
+
+    Returns
+    -------
+    spec : dict
+        The diagram spec, see py2drawio.batch.build
+    """
+    from yaml import safe_load
+    with open(path) as f:
+        spec = safe_load(f)
+    if not isinstance(spec, dict):
+        raise ValueError(f"{path} does not hold a diagram spec")
+    base = dirname(path)
+    for field in ('template', 'output'):
+        value = spec.get(field)
+        if isinstance(value, str) and not isabs(value):
+            spec[field] = join(base, value)
+    if spec.get('output') is None:
+        spec['output'] = f"{splitext(path)[0]}.drawio"
+    return spec
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(prog="py2drawio", description="Build draw.io diagrams from declarative specs")
+    cache_help = "the directory of the build cache, see py2drawio.templates.cache_dir"
+    parser.add_argument("--cache-dir", help=cache_help)
+    commands = parser.add_subparsers(dest="command")
+    build = commands.add_parser("build", help="build diagrams from yaml or JSON specs, reusing cached builds of unchanged specs")
+    build.add_argument("specs", nargs="+", help="the spec files")
+    build.add_argument("-o", "--output", help="the draw.io file to be written, for a single spec. Defaults to the output of the spec.")
+    build.add_argument("--no-cache", action="store_true", help="build every spec without reading or writing the cache")
+    clear = commands.add_parser("clear-cache", help="drop every cached build, layout and parsed template")
+    for command in (build, clear):
+        # accepted after the command as well, without overriding a value given before it
+        command.add_argument("--cache-dir", default=argparse.SUPPRESS, help=cache_help)
+    serve = commands.add_parser("serve", help="run a local render service accepting JSON specs over HTTP")
+    serve.add_argument("--host", default="127.0.0.1", help="the address to listen on")
+    serve.add_argument("--port", type=int, default=8080, help="the TCP port to listen on")
+    serve.add_argument("--socket", help="the Unix socket to listen on instead of a TCP port")
+    serve.add_argument("--workers", type=int, help="the number of worker processes, one per CPU by default")
+    serve.add_argument("--max-concurrent", type=int, help="the number of renders running at once, one per worker by default")
+    serve.add_argument("--max-queue", type=int, default=64, help="the number of renders waiting for a worker before requests are refused")
+    serve.add_argument("--template", action="append", default=[], help="a template file loaded by every worker on start up")
+    args = parser.parse_args(argv)
+    if args.cache_dir is not None:
+        os.environ["PY2DRAWIO_CACHE_DIR"] = args.cache_dir
+    if args.command == "clear-cache":
+        clear_cache()
+        return
+    if args.command == "serve":
+        from .server import serve as run_server
+        run_server(
+            args.host,
+            args.port,
+            args.socket,
+            workers=args.workers,
+            templates=args.template,
+            max_concurrent=args.max_concurrent,
+            max_queue=args.max_queue,
+        )
+        return
+    if args.command != "build":
+        parser.error("a command is required")
+    if args.output is not None and len(args.specs) > 1:
+        parser.error("--output can only be given with a single spec")
+    failed = 0
+    for path in args.specs:
+        start = perf_counter()
+        try:
+            result = build_cached(load_spec(path), args.output, disk_cache=not args.no_cache)
+        except Exception as error:
+            failed += 1
+            print(f"{path}: {error}", file=sys.stderr)
+            continue
+        state = "cached" if result.hit else "built"
+        print(f"{path} -> {result.output} ({state}, {(perf_counter() - start) * 1000:.0f} ms)")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import xml.etree.ElementTree as ET
+from .diagram import Diagram, _number
+
+
+class Node:
+    """
+    A compact node record with numeric geometry
+
+    Nodes expose tag, attrib and get like the ElementTree elements used by Diagram, so code that reads node IDs, types or labels works with either backend.
+    """
+    __slots__ = ('id', 'type', 'label', 'layer', 'parent', 'x', 'y', 'width', 'height')
+    tag = 'object'
+
+    def __init__(self, node_id: str, node_type: str, label: str, layer, parent: str, x, y, width, height):
+        self.id = node_id
+        self.type = node_type
+        self.label = label
+        self.layer = layer
+        self.parent = parent
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    @property
+    def attrib(self):
+        return {'label': self.label, 'id': self.id, 'type': self.type, 'layer': str(self.layer)}
+
+    def get(self, key: str, default=None):
+        return self.attrib.get(key, default)
+
+
+class Edge:
+    """
+    A compact edge record
+    """
+    __slots__ = ('id', 'label', 'source', 'target', 'aggregated', 'aggregated_names')
+    tag = 'object'
+
+    def __init__(self, edge_id: str, label: str, source: str, target: str):
+        self.id = edge_id
+        self.label = label
+        self.source = source
+        self.target = target
+        # set on the edges made by aggregate_edges
+        self.aggregated = None
+        self.aggregated_names = None
+
+    @property
+    def attrib(self):
+        attrib = {'label': self.label, 'id': self.id, 'type': 'edge'}
+        if self.aggregated is not None:
+            attrib['aggregated'] = self.aggregated
+        if self.aggregated_names is not None:
+            attrib['aggregated_names'] = self.aggregated_names
+        return attrib
+
+    def get(self, key: str, default=None):
+        return self.attrib.get(key, default)
+
+
+class CompactDiagram(Diagram):
+    """
+    A draw.io diagram builder that keeps nodes and edges as compact records instead of XML elements
+
+    Nodes and edges are stored as Node and Edge records with numeric geometry, and the node style is looked up from the template only when XML is produced. The XML of each node is only built while the diagram is being written, one node at a time, or for a single node when element is called. The add_node, add_nodes, add_edge, add_edges, upsert_node, remove_node, sync, edges_of, aggregate_edges, compose_children, compose_parents, compose_all, compose_changed, get and write methods behave as in Diagram and produce the same file. CompactDiagram only builds new diagrams, use Diagram to edit existing files.
+
+    Attributes
+    ----------
+    template : str or dict, optional
+        The filename of the template file in yaml format to be used, or an already loaded template. If not specified, the default template will be used.
+    """
+    _node_class = Node
+
+    def __init__(self, template = None, stats = None):
+        """
+        Parameters
+        ----------
+        template : str or dict, optional
+            The filename of the template file in yaml format to be used, or an already loaded template. If not specified, the default template will be used.
+        stats : bool or Stats, optional
+            If true, the diagram is instrumented, see Diagram
+        """
+        super().__init__(template=template, stats=stats)
+
+    def _node_element(self, node_id: str, node_type: str, node_name: str, height: str, width: str, layer, parent_id: str):
+        return Node(node_id, node_type, node_name, layer, parent_id, 0, 0, _number(width), _number(height))
+
+    def _edge_element(self, edge_id: str, source_id: str, target_id: str, name: str):
+        return Edge(edge_id, name, source_id, target_id)
+
+    def _insert(self, elements):
+        # records only live in the indexes until the diagram is written
+        pass
+
+    def _discard(self, elements):
+        pass
+
+    def _parent_id(self, node: Node):
+        return node.parent
+
+    def _set(self, node, key: str, value):
+        setattr(node, key, value)
+
+    def _is_node(self, element):
+        return isinstance(element, Node)
+
+    def _edge_ends(self, element):
+        if isinstance(element, Edge):
+            return element.source, element.target
+        return None
+
+    def _geometry(self, node: Node):
+        return node
+
+    def _size(self, node: Node):
+        return node.width, node.height
+
+    def _position(self, node: Node):
+        return node.x, node.y
+
+    def _move(self, node: Node, x, y):
+        node.x = x
+        node.y = y
+
+    def _resize(self, node: Node, width, height):
+        node.width = width
+        node.height = height
+
+    def _materialize(self, record):
+        if isinstance(record, Edge):
+            edge = Diagram._edge_element(self, record.id, record.source, record.target, record.label)
+            if record.aggregated is not None:
+                edge.set('aggregated', record.aggregated)
+            if record.aggregated_names is not None:
+                edge.set('aggregated_names', record.aggregated_names)
+            return edge
+        node = ET.Element('object', {'label': record.label, 'id': record.id, 'type': record.type, 'layer': str(record.layer)})
+        mxcell = ET.SubElement(node, 'mxCell', {'style': self.nodetypes[record.type]['style'], 'vertex': '1', 'parent': record.parent})
+        ET.SubElement(mxcell, 'mxGeometry', {'x': str(record.x), 'y': str(record.y), 'width': str(record.width), 'height': str(record.height), 'as': 'geometry'})
+        return node
+
+    def element(self, node_id: str):
+        """
+        Builds the XML element of a node or edge
+
+        The element is a snapshot, changes made to it are not reflected in the diagram.
+
+        Parameters
+        ----------
+        node_id : str
+            The ID of the node or edge
+
+        Returns
+        -------
+        element : ET.Element or None
+            The element of the node or edge with the given ID, or None if no such node or edge exists
+        """
+        record = self._index.get(node_id)
+        if not isinstance(record, (Node, Edge)):
+            return record
+        return self._materialize(record)
+
+    def _cells(self, page):
+        # the elements of the records are built and serialized one at a time while the page is streamed
+        records = (record for record in page.index.values() if isinstance(record, (Node, Edge)))
+        return map(self._materialize, records)
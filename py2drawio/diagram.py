@@ -1,8 +1,141 @@
+import json
 import xml.etree.ElementTree as ET
-from math import ceil,sqrt
-from yaml import safe_load, safe_dump
-from os.path import realpath
+from collections import namedtuple
+from collections.abc import Mapping
+from contextlib import ExitStack
+from gzip import GzipFile
+from hashlib import sha256
+from io import BytesIO
+from math import ceil
+from time import perf_counter
 from .base_xml import base_xml
+from .instrument import Stats, instrument
+from .layout import grid_layout, layout_tree
+from .loader import BLANK_CONTAINER, harvest_node_types, index_cells, load, save_node_types
+from .templates import load_template
+from .writer import write_mxfile, write_page
+
+EDGE_STYLE = "edgeStyle=orthogonalEdgeStyle;rounded=0;orthogonalLoop=1;jettySize=auto;html=1;"
+NODE_FIELDS = ('node_id', 'node_type', 'node_name', 'node_height', 'node_width', 'layer', 'parent')
+EDGE_FIELDS = ('source', 'target', 'name')
+# The ID of the root cell, the parent of top-level nodes. Pass it as the parent of an existing node to move it to the top level.
+ROOT_ID = "1"
+
+SyncResult = namedtuple('SyncResult', ['added', 'updated', 'removed'])
+SyncResult.__doc__ = """
+The changes made to a page by Diagram.sync
+
+Attributes
+----------
+added : list of str
+    The IDs of the nodes and edges that were added
+updated : list of str
+    The IDs of the nodes and edges that were changed in place
+removed : list of str
+    The IDs of the nodes and edges that were removed
+"""
+
+
+def _number(value):
+    """
+    Parses a size, keeping integers as int
+    """
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def _batch_row(record, fields: tuple):
+    """
+    Normalises a tuple, named tuple or dict record of a batch into a tuple of fields, with empty strings treated as missing values. Returns an error message for malformed records.
+    """
+    if hasattr(record, '_asdict'):
+        record = record._asdict()
+    if isinstance(record, dict):
+        unknown = record.keys() - set(fields)
+        if unknown:
+            return f"Unknown fields {', '.join(sorted(unknown))}"
+        values = tuple([record.get(field) for field in fields])
+    else:
+        values = tuple(record)
+        if len(values) > len(fields):
+            return f"Too many values, expected at most {len(fields)}"
+        if len(values) < len(fields):
+            values += (None,) * (len(fields) - len(values))
+    if "" in values:
+        values = tuple([None if value == "" else value for value in values])
+    return values
+
+
+class BatchError(ValueError):
+    """
+    Raised when a batch of nodes or edges is invalid
+
+    Attributes
+    ----------
+    errors : list of str
+        Every problem found in the batch
+    """
+    def __init__(self, errors: list):
+        self.errors = errors
+        super().__init__(f"{len(errors)} invalid rows:\n" + "\n".join(errors))
+
+
+def _layout_page(roots: list, children: dict, sizes: dict, options: dict, memo: dict = None):
+    """
+    Lays out the numeric tree of a page, returning the positions of the nodes and the new sizes of the containers so it can run in a worker process
+    """
+    positions = layout_tree(roots, children, sizes, options, memo)
+    return positions, {node_id: sizes[node_id] for node_id in children}
+
+
+class Page:
+    """
+    A page of a diagram, with its own nodes, edges and indexes
+
+    Attributes
+    ----------
+    element : ET.Element
+        The diagram element of the page
+    root : ET.Element
+        The root element holding the cells of the page
+    index : dict
+        Maps the IDs of the nodes and edges of the page to the nodes and edges
+    children : dict
+        Maps parent IDs to the list of their child nodes
+    outgoing : dict
+        Maps node IDs to the list of the edges leaving them
+    incoming : dict
+        Maps node IDs to the list of the edges entering them
+    stale : set
+        The IDs of the containers whose children were added, removed, moved or resized since they were last composed
+    unplaced : set
+        The IDs of the nodes added to or moved into a container since it was last composed
+    """
+    def __init__(self, element: ET.Element, root: ET.Element, index: dict, children: dict, outgoing: dict, incoming: dict):
+        self.element = element
+        self.root = root
+        self.index = index
+        self.children = children
+        self.outgoing = outgoing
+        self.incoming = incoming
+        self.stale = set()
+        self.unplaced = set()
+        # (compressed, bytes) of the last serialization of the page, while it is up to date
+        self._serialized = None
+
+    @property
+    def name(self):
+        return self.element.get('name')
+
+    def changed(self):
+        """
+        Marks the page as changed, so that it is serialized again the next time the diagram is written
+
+        The methods of Diagram call it themselves, it only needs to be called after editing the elements of a page directly.
+        """
+        self._serialized = None
 
 
 class Diagram:
@@ -13,37 +146,260 @@ class Diagram:
     ----------
     filename : str, optional
         The filename of the draw.io file to be edited. If not specified, a new file will be created.
-    template : str, optional
-        The filename of the template file in yaml format to be used. If not specified, the default template will be used.
+    template : str or dict, optional
+        The filename of the template file in yaml format to be used, or an already loaded template. If not specified, the default template will be used.
+    pages : dict
+        Maps page names to the pages of the diagram, in file order
+    page : Page
+        The current page, which nodes and edges are added to and looked up in
+    stats : Stats or None
+        The timings and counters of the diagram, if it is instrumented
     """
     base_xml = base_xml
-    def __init__(self, filename: str=None, template: str = None):
+    # the type of the nodes and edges handed out by this class
+    _node_class = ET.Element
+
+    def __init__(self, filename: str=None, template = None, pages: list = None, stats = None):
         """
         Parameters
         ----------
         filename : str, optional
-            The filename of the draw.io file to be edited. If not specified, a new file will be created.
-        template : str, optional
-            The filename of the template file in yaml format to be used. If not specified, the default template will be used.
+            The filename of the draw.io file to be edited. If not specified, a new file will be created. The file is parsed in a single streaming pass and compressed pages are decoded transparently.
+        template : str or dict, optional
+            The filename of the template file in yaml format to be used, or an already loaded template. If not specified, the default template will be used. Template files are parsed once per process, see py2drawio.templates.load_template, and every diagram gets its own copy of the node types.
+        pages : list, optional
+            The names or 0-based positions of the pages of the file to be loaded. The first loaded page is edited. Pages that are not loaded are written back unchanged. If not specified, every page will be loaded.
+        stats : bool or Stats, optional
+            If true, the diagram is instrumented: template loading, file loading, node and edge insertion, composition and writing are timed, node, edge and cell lookups and created elements are counted, and the figures are collected in the stats attribute. A Stats object can be given to share it between diagrams or to subscribe hooks before the template is loaded. Default None, no instrumentation and no overhead
         """
-        if template is not None:
-            template_path = template
+        self.stats = None
+        if stats:
+            self.stats = stats if isinstance(stats, Stats) else Stats()
+            instrument(self, self.stats)
+            start = perf_counter()
+        if isinstance(template, dict):
+            self.nodetypes = template
         else:
-            template_path = realpath(__file__).replace("diagram.py", "nodetypes.yml")
-        with open(template_path) as f:
-            self.nodetypes = safe_load(f)
+            nodetypes = template if isinstance(template, Mapping) else load_template(template)
+            # loaded templates are shared and read-only, every diagram gets its own copy
+            self.nodetypes = {name: dict(entry) if isinstance(entry, Mapping) else entry for name, entry in nodetypes.items()}
+        if self.stats is not None:
+            self.stats.record('template', perf_counter() - start, {'template': template if not isinstance(template, dict) else None})
+            start = perf_counter()
+        self.pages = {}
         if filename is None:
             self.filename = None
             self.root = ET.fromstring(self.base_xml)            
+            page = self.root.find("./diagram")
+            diagroot = page.find("./mxGraphModel/root")
+            self.pages[page.get('name')] = Page(page, diagroot, *index_cells(diagroot))
         else:  
             self.filename = filename
-            self.root = ET.parse(filename).getroot()
-        self.diagroot = self.root.find("./diagram/mxGraphModel/root")
+            self.root, loaded = load(filename, pages)
+            if len(loaded) == 0:
+                raise ValueError(f"No page to be loaded found in {filename}")
+            for page in loaded:
+                self.pages.setdefault(page.page.get('name'), Page(*page))
+            if self.stats is not None:
+                self.stats.record('load', perf_counter() - start, {'filename': filename, 'pages': len(loaded)})
+        self.select_page(next(iter(self.pages.values())))
+
+    def add_page(self, name: str):
+        """
+        Adds an empty page to the diagram and makes it the current page
+
+        Pages have their own nodes, edges and indexes, node IDs only need to be unique within a page.
+
+        Parameters
+        ----------
+        name : str
+            The name of the page to be added. It must differ from the names of every page of the file, including the pages that were not loaded.
+
+        Returns
+        -------
+        page : Page
+            The page that was added
+        """
+        # pages of the file that were not loaded are written back too, so their names and IDs are taken as well
+        existing = self.root.findall("./diagram")
+        if name in self.pages or any(page.get('name') == name for page in existing):
+            raise ValueError(f"Page {name} already exists")
+        ids = {page.get('id') for page in existing}
+        page_id = sha256(name.encode()).hexdigest()[:20]
+        suffix = 0
+        while page_id in ids:
+            suffix += 1
+            page_id = sha256(f"{name}-{suffix}".encode()).hexdigest()[:20]
+        element = ET.fromstring(self.base_xml).find("./diagram")
+        element.set('name', name)
+        element.set('id', page_id)
+        if len(self.root):
+            element.tail = self.root[-1].tail
+            self.root[-1].tail = self.root.text
+        self.root.append(element)
+        diagroot = element.find("./mxGraphModel/root")
+        self.pages[name] = Page(element, diagroot, *index_cells(diagroot))
+        return self.select_page(name)
+
+    def select_page(self, page):
+        """
+        Makes a page the current page, which nodes and edges are added to and looked up in
+
+        Parameters
+        ----------
+        page : str or Page
+            The name of the page, or the page itself
+
+        Returns
+        -------
+        page : Page
+            The current page
+        """
+        if not isinstance(page, Page):
+            if page not in self.pages:
+                raise ValueError(f"Page {page} not found")
+            page = self.pages[page]
+        self.page = page
+        self.diagroot = page.root
+        self._index = page.index
+        self._children = page.children
+        self._outgoing = page.outgoing
+        self._incoming = page.incoming
+        return page
+
+    def get(self, node_id: str):
+        """
+        Looks up a node or edge by its ID
+
+        Parameters
+        ----------
+        node_id : str
+            The ID of the node or edge to be found
+
+        Returns
+        -------
+        node : Node or None
+            The node or edge with the given ID, or None if no such element exists
+        """
+        return self._index.get(node_id)
+
+    def edges_of(self, node, direction: str = "both"):
+        """
+        Looks up the edges attached to a node
+
+        Parameters
+        ----------
+        node : Node or str
+            The node, or its ID
+        direction : {"both", "out", "in"}, optional
+            "out" for the edges leaving the node, "in" for the edges entering it, "both" for all of them. Default "both"
+
+        Returns
+        -------
+        edges : list of Edge
+            The edges, in the order they were added. An edge from the node to itself is listed once.
+        """
+        node_id = node.attrib.get('id') if isinstance(node, self._node_class) else str(node)
+        if direction == "out":
+            return list(self._outgoing.get(node_id, ()))
+        if direction == "in":
+            return list(self._incoming.get(node_id, ()))
+        if direction != "both":
+            raise ValueError("Direction must be both, out or in")
+        edges = list(self._outgoing.get(node_id, ()))
+        edges.extend(edge for edge in self._incoming.get(node_id, ()) if self._edge_ends(edge)[0] != node_id)
+        return edges
+
+    def _set_parent(self, node: ET.Element, parent_id: str):
+        """
+        Sets the parent of a node and keeps the parent to children index up to date
+        """
+        old_parent_id = self._parent_id(node)
+        if old_parent_id in self._children and node in self._children[old_parent_id]:
+            self._children[old_parent_id].remove(node)
+        self._set(node, 'parent', parent_id)
+        self._children.setdefault(parent_id, []).append(node)
+
+    def _parent_id(self, node: ET.Element):
+        return node.find('mxCell').attrib.get('parent')
+
+    def _set(self, node: ET.Element, key: str, value):
+        """
+        Sets the type, label, layer or parent ID of a node, or the label of an edge, without updating the indexes
+        """
+        if key == 'parent':
+            node.find('mxCell').set('parent', value)
+            return
+        node.set(key, str(value))
+        if key == 'type':
+            node.find('mxCell').set('style', self.nodetypes[value]['style'])
+
+    def _is_node(self, element: ET.Element):
+        """
+        Tells whether an element of the index is a node, rather than an edge or one of the base cells
+        """
+        if element.tag != 'object':
+            return False
+        mxcell = element.find('mxCell')
+        return mxcell is not None and mxcell.attrib.get('edge') != '1'
+
+    def _edge_ends(self, element: ET.Element):
+        """
+        Returns the (source ID, target ID) of an edge, or None if the element is not an edge
+        """
+        mxcell = element if element.tag == 'mxCell' else element.find('mxCell')
+        if mxcell is None or mxcell.attrib.get('edge') != '1':
+            return None
+        return mxcell.attrib.get('source'), mxcell.attrib.get('target')
+
+    def _insert(self, elements):
+        """
+        Appends new node or edge elements to the diagram
+        """
+        self.diagroot.extend(elements)
+
+    def _discard(self, elements):
+        """
+        Removes node or edge elements from the diagram
+        """
+        elements = set(elements)
+        if len(elements) == 1:
+            self.diagroot.remove(next(iter(elements)))
+        elif elements:
+            self.diagroot[:] = [element for element in self.diagroot if element not in elements]
+
+    def _geometry(self, node):
+        """
+        Returns the geometry of a node, as passed to _size, _move and _resize
+        """
+        return node.find('mxCell').find('mxGeometry')
+
+    def _size(self, geometry):
+        """
+        Returns the (width, height) of a geometry as numbers
+        """
+        return int(geometry.get('width')), int(geometry.get('height'))
+
+    def _position(self, geometry):
+        """
+        Returns the (x, y) of a geometry as numbers
+        """
+        return float(geometry.get('x', 0)), float(geometry.get('y', 0))
+
+    def _move(self, geometry, x, y):
+        geometry.set('x', str(x))
+        geometry.set('y', str(y))
+
+    def _resize(self, geometry, width, height):
+        geometry.set('width', str(width))
+        geometry.set('height', str(height))
 
     def extract_node_types(self, outfile: str):
         """
         Extracts the node types from a draw.io file and saves them to a yaml file
 
+        To harvest node types from a large file without loading it, use py2drawio.loader.extract_node_types.
+
         Parameters
         ----------
         outfile : str
@@ -53,29 +409,8 @@ class Diagram:
         -------
         None
         """
-        node_types = {}
-        node_types["BlankContainer"] =  {
-            "style": "fillColor=none;strokeColor=none;dashed=0;verticalAlign=top;fontStyle=0;fontColor=#232F3D;",
-            "width": "130",
-            "height": "130",
-        }
-        for node in self.diagroot.iter('mxCell'):
-            type = node.attrib.get('value')
-            if type is not None:
-                style = node.attrib.get('style')
-                geometries = node.findall('mxGeometry')
-                if len(geometries) > 0:
-                    width = geometries[0].attrib.get('width')
-                    height = geometries[0].attrib.get('height')
-                # if style is not None and width is not None and height is not None:
-                if type not in node_types.keys():
-                    node_types[type] = {
-                        'style': style,
-                        'width': width,
-                        'height': height
-                    }
-        with open(outfile, 'w') as f:
-            f.write(safe_dump(node_types, default_flow_style=False))
+        node_types = harvest_node_types(self.diagroot.iter('mxCell'), {"BlankContainer": dict(BLANK_CONTAINER)})
+        save_node_types(node_types, outfile)
 
     def add_node(self, node_id: str, node_type: str, node_name: str, node_height:int = None, node_width: int = None, layer: int = 0, parent = None):
         """
@@ -105,22 +440,21 @@ class Diagram:
         """
         if node_id in ["0", "1"]:
             raise ValueError("Node ID cannot be 0 or 1")
-        existing_nodes = [node for node in self.diagroot if node.tag == "object" and node.attrib['id'] == node_id]
-        if len(existing_nodes) > 0:
+        if node_id in self._index:
             raise ValueError(f"Node with ID {node_id} already exists")
         if node_type not in self.nodetypes:
             raise ValueError(f"Node type {node_type} not found")
         if node_height is None:
             height = self.nodetypes[node_type]['height']
         else:
-            x = str(node_height)
+            height = str(node_height)
         if node_width is None: 
             width = self.nodetypes[node_type]['width']
         else:
             width = str(node_width)
         if parent is None:
             parent_id = "1"
-        elif not isinstance(parent, ET.Element):
+        elif not isinstance(parent, self._node_class):
             raise ValueError("Parent must be a Node")
         elif parent.attrib.get('type') not in self.nodetypes:
             raise ValueError("Parent must be a valid node type")
@@ -128,24 +462,25 @@ class Diagram:
         #     raise ValueError("Parent must be in a lower layer than the node")
         else:
             parent_id = parent.attrib.get('id')
-            
-        node = ET.SubElement(self.diagroot, 'object')
-        node.set('label', node_name)
-        node.set('id', node_id)
-        node.set('type', node_type)
-        node.set('layer', str(layer))
-        mxcell = ET.SubElement(node, 'mxCell')
-        mxcell.set('style', self.nodetypes[node_type]['style'])
-        mxcell.set('vertex', '1')
-        mxcell.set('parent', parent_id)
-        mxgeometry = ET.SubElement(mxcell, 'mxGeometry')
-        mxgeometry.set('x', '0')
-        mxgeometry.set('y', '0')
-        mxgeometry.set('width', width)
-        mxgeometry.set('height', height)
-        mxgeometry.set('as', 'geometry') 
+
+        node = self._node_element(node_id, node_type, node_name, height, width, layer, parent_id)
+        self.page.changed()
+        self._insert([node])
+        self._index[node_id] = node
+        self._children.setdefault(parent_id, []).append(node)
+        self.page.stale.add(parent_id)
+        self.page.unplaced.add(node_id)
         return node
-    
+
+    def _node_element(self, node_id: str, node_type: str, node_name: str, height: str, width: str, layer, parent_id: str):
+        """
+        Builds the element of a node without validating or registering it
+        """
+        node = ET.Element('object', {'label': node_name, 'id': node_id, 'type': node_type, 'layer': str(layer)})
+        mxcell = ET.SubElement(node, 'mxCell', {'style': self.nodetypes[node_type]['style'], 'vertex': '1', 'parent': parent_id})
+        ET.SubElement(mxcell, 'mxGeometry', {'x': '0', 'y': '0', 'width': width, 'height': height, 'as': 'geometry'})
+        return node
+
     def add_edge(self, source: ET.Element, target: ET.Element, name: str = None):
         """
         Adds an edge between two nodes to the diagram
@@ -164,36 +499,546 @@ class Diagram:
         edge : Edge
             The edge that was added
         """
-        default_style="edgeStyle=orthogonalEdgeStyle;rounded=0;orthogonalLoop=1;jettySize=auto;html=1;"
-        if not isinstance(source, ET.Element):
+        if not isinstance(source, self._node_class):
             raise ValueError("Source must be a Node")
         if source.attrib.get('type') not in self.nodetypes:
             raise ValueError("Source must be a valid node type")
-        if not isinstance(target, ET.Element):          
+        if not isinstance(target, self._node_class):          
             raise ValueError("Target must be a Node")
         if target.attrib.get('type') not in self.nodetypes:
             raise ValueError("Target must be a valid node type")
         if name is None:
             name = ""
         id = f"{source.attrib.get('id')}-{target.attrib.get('id')}"
-        existing_edges = [edge for edge in self.diagroot if edge.tag == "object" and edge.attrib.get('id') == id]
-        if len(existing_edges) > 0:
+        if id in self._index:
             raise ValueError(f"Edge between {source.attrib.get('id')} and {target.attrib.get('id')} already exists")
-        edge = ET.SubElement(self.diagroot, 'object')
-        edge.set('label', name)
-        edge.set('id', id)
-        edge.set('type', 'edge')
-        mxcell = ET.SubElement(edge, 'mxCell')
-        mxcell.set('style', default_style)
-        mxcell.set('edge', '1')
-        mxcell.set('parent', '1')
-        mxcell.set('source', source.attrib.get('id'))
-        mxcell.set('target', target.attrib.get('id'))
-        mxgeometry = ET.SubElement(mxcell, 'mxGeometry')
-        mxgeometry.set('relative', '1')
-        mxgeometry.set('as', 'geometry')
+        edge = self._edge_element(id, source.attrib.get('id'), target.attrib.get('id'), name)
+        self.page.changed()
+        self._insert([edge])
+        self._index[id] = edge
+        self._outgoing.setdefault(source.attrib.get('id'), []).append(edge)
+        self._incoming.setdefault(target.attrib.get('id'), []).append(edge)
         return edge
-    
+
+    def _edge_element(self, edge_id: str, source_id: str, target_id: str, name: str):
+        """
+        Builds the element of an edge without validating or registering it
+        """
+        edge = ET.Element('object', {'label': name, 'id': edge_id, 'type': 'edge'})
+        mxcell = ET.SubElement(edge, 'mxCell', {'style': EDGE_STYLE, 'edge': '1', 'parent': '1', 'source': source_id, 'target': target_id})
+        ET.SubElement(mxcell, 'mxGeometry', {'relative': '1', 'as': 'geometry'})
+        return edge
+
+    def add_nodes(self, nodes):
+        """
+        Adds many nodes to the diagram at once
+
+        The whole batch is validated before any node is added, and all problems are reported together. Parents can be given by ID and may be defined anywhere in the same batch, parents are always written before their children.
+
+        Parameters
+        ----------
+        nodes : iterable
+            The nodes to be added. Each node is either a tuple with the positional arguments of add_node, or a dict (such as a csv.DictReader or JSON lines record) with its keyword arguments. Parents may be given as a Node or as a node ID. Empty strings are treated as unspecified values.
+
+        Returns
+        -------
+        nodes : list of Node
+            The nodes that were added, in the order they were given
+
+        Raises
+        ------
+        BatchError
+            If any node of the batch is invalid. No node is added in that case.
+        """
+        rows, order, errors = self._node_rows(nodes)
+        if errors:
+            raise BatchError([f"Row {number}: {error}" for number, error in errors])
+        created = self._create_nodes(rows, order)
+        return [created[node_id] for node_id in rows]
+
+    def add_edges(self, edges):
+        """
+        Adds many edges to the diagram at once
+
+        The whole batch is validated before any edge is added, and all problems are reported together.
+
+        Parameters
+        ----------
+        edges : iterable
+            The edges to be added. Each edge is either a (source, target) or (source, target, name) tuple, or a dict with source, target and optional name keys. Sources and targets may be given as a Node or as a node ID.
+
+        Returns
+        -------
+        edges : list of Edge
+            The edges that were added, in the order they were given
+
+        Raises
+        ------
+        BatchError
+            If any edge of the batch is invalid. No edge is added in that case.
+        """
+        rows, errors = self._edge_rows(edges)
+        if errors:
+            raise BatchError([f"Row {number}: {error}" for number, error in errors])
+        return list(self._create_edges(rows).values())
+
+    def _node_rows(self, nodes, updates: dict = None, prune: bool = False):
+        """
+        Validates a batch of nodes as add_nodes does
+
+        Returns the rows of the new nodes by ID, the IDs of the new nodes in creation order (parents first) and the (row number, message) of every problem found. If updates is given, nodes that already exist are collected in it instead of being rejected, with the sizes and layer that are not given left as None and their current parent when none is given. If prune is set, parents must be part of the batch.
+        """
+        errors = []
+        rows = {}
+        for number, node in enumerate(nodes):
+            row = _batch_row(node, NODE_FIELDS)
+            if isinstance(row, str):
+                errors.append((number, row))
+                continue
+            node_id, node_type, node_name, node_height, node_width, layer, parent = row
+            if node_id is None or node_type is None or node_name is None:
+                errors.append((number, "node_id, node_type and node_name are required"))
+                continue
+            node_id = str(node_id)
+            target = rows
+            if node_id in ["0", "1"]:
+                errors.append((number, "Node ID cannot be 0 or 1"))
+                continue
+            elif node_id in rows or (updates is not None and node_id in updates):
+                errors.append((number, f"Node with ID {node_id} already exists"))
+                continue
+            elif node_id in self._index:
+                if updates is None:
+                    errors.append((number, f"Node with ID {node_id} already exists"))
+                    continue
+                if not self._is_node(self._index[node_id]):
+                    errors.append((number, f"Element with ID {node_id} is not a node"))
+                    continue
+                target = updates
+            nodetype = self.nodetypes.get(node_type)
+            if nodetype is None:
+                errors.append((number, f"Node type {node_type} not found"))
+            if nodetype is None or target is updates:
+                # existing nodes keep their size unless one is given
+                nodetype = {'height': None, 'width': None}
+            if isinstance(parent, self._node_class):
+                parent = parent.attrib.get('id')
+            if target is updates:
+                # existing nodes keep their layer and parent unless one is given
+                if parent is None:
+                    parent = self._parent_id(self._index[node_id])
+            elif layer is None:
+                layer = 0
+            target[node_id] = (
+                number,
+                node_type,
+                str(node_name),
+                nodetype['height'] if node_height is None else str(node_height),
+                nodetype['width'] if node_width is None else str(node_width),
+                layer,
+                ROOT_ID if parent is None else str(parent),
+            )
+
+        parents = rows if updates is None else {**updates, **rows}
+        for node_id, row in parents.items():
+            parent = row[6]
+            if parent == ROOT_ID or parent in parents:
+                continue
+            if prune or parent not in self._index or not self._is_node(self._index[parent]):
+                errors.append((row[0], f"Parent {parent} not found"))
+            elif self._index[parent].attrib.get('type') not in self.nodetypes:
+                errors.append((row[0], "Parent must be a valid node type"))
+
+        # parents defined in the batch are emitted before their children
+        order = []
+        state = {}
+        for node_id in parents:
+            chain = []
+            while node_id not in state:
+                if node_id in parents:
+                    parent = parents[node_id][6]
+                elif updates is not None and node_id in self._index and self._is_node(self._index[node_id]):
+                    # a moved node can close a cycle through nodes that are not in the batch
+                    parent = self._parent_id(self._index[node_id])
+                else:
+                    break
+                state[node_id] = False
+                chain.append(node_id)
+                node_id = parent
+            if state.get(node_id) is False:
+                errors.append((parents[chain[0]][0], f"Parent cycle through node {node_id}"))
+            for node_id in reversed(chain):
+                state[node_id] = True
+                if node_id in rows:
+                    order.append(node_id)
+
+        errors.sort(key=lambda error: error[0])
+        return rows, order, errors
+
+    def _create_nodes(self, rows: dict, order: list):
+        """
+        Creates and registers the nodes of validated rows
+        """
+        self.page.changed()
+        created = {}
+        for node_id in order:
+            number, node_type, node_name, height, width, layer, parent_id = rows[node_id]
+            node = created[node_id] = self._node_element(node_id, node_type, node_name, height, width, layer, parent_id)
+            self._children.setdefault(parent_id, []).append(node)
+            self.page.stale.add(parent_id)
+        self.page.unplaced.update(created)
+        self._insert(created.values())
+        self._index.update(created)
+        return created
+
+    def _edge_rows(self, edges, updates: dict = None, pending = (), removed = ()):
+        """
+        Validates a batch of edges as add_edges does
+
+        Returns the rows of the new edges by ID and the (row number, message) of every problem found. If updates is given, edges that already exist are collected in it instead of being rejected, with their name left as None when none is given. Nodes whose IDs are in pending are about to be added, and nodes whose IDs are in removed about to be removed.
+        """
+        errors = []
+        rows = {}
+        for number, edge in enumerate(edges):
+            row = _batch_row(edge, EDGE_FIELDS)
+            if isinstance(row, str):
+                errors.append((number, row))
+                continue
+            ends = []
+            for field, end in zip(EDGE_FIELDS, row[:2]):
+                if isinstance(end, self._node_class):
+                    end = end.attrib.get('id')
+                ends.append(str(end))
+                if end is not None and str(end) in pending:
+                    continue
+                node = self._index.get(str(end)) if end is not None else None
+                if node is None or not self._is_node(node) or str(end) in removed:
+                    errors.append((number, f"{field.capitalize()} {end} not found"))
+                elif node.attrib.get('type') not in self.nodetypes:
+                    errors.append((number, f"{field.capitalize()} must be a valid node type"))
+            edge_id = f"{ends[0]}-{ends[1]}"
+            target = rows
+            if edge_id in rows or (updates is not None and edge_id in updates):
+                errors.append((number, f"Edge between {ends[0]} and {ends[1]} already exists"))
+            elif edge_id in self._index:
+                if updates is None:
+                    errors.append((number, f"Edge between {ends[0]} and {ends[1]} already exists"))
+                elif self._edge_ends(self._index[edge_id]) is None:
+                    errors.append((number, f"Element with ID {edge_id} is not an edge"))
+                else:
+                    target = updates
+            name = None if row[2] is None else str(row[2])
+            if name is None and target is rows:
+                name = ""
+            target[edge_id] = (ends[0], ends[1], name)
+        return rows, errors
+
+    def _create_edges(self, rows: dict):
+        """
+        Creates and registers the edges of validated rows
+        """
+        self.page.changed()
+        created = {}
+        for edge_id, (source_id, target_id, name) in rows.items():
+            edge = created[edge_id] = self._edge_element(edge_id, source_id, target_id, name)
+            self._outgoing.setdefault(source_id, []).append(edge)
+            self._incoming.setdefault(target_id, []).append(edge)
+        self._insert(created.values())
+        self._index.update(created)
+        return created
+
+    def upsert_node(self, node_id: str, node_type: str, node_name: str, node_height:int = None, node_width: int = None, layer: int = None, parent = None):
+        """
+        Adds a node to the diagram, or updates the node with the same ID if it already exists
+
+        Only the attributes that differ are changed. An existing node keeps its geometry, layer and parent unless they are given, and its container is marked for compose_changed when the node is moved to another parent or resized.
+
+        Parameters
+        ----------
+        node_id : str
+            The ID of the node to be added or updated
+        node_type : str
+            The type of the node
+        node_name : str
+            The name of the node
+        node_height : int, optional
+            The height of the node. If not specified, a new node gets the default height for the node type and an existing node keeps its height.
+        node_width : int, optional
+            The width of the node. If not specified, a new node gets the default width for the node type and an existing node keeps its width.
+        layer : int, optional
+            The layer of the node. If not specified, a new node will be in layer 0 and an existing node keeps its layer.
+        parent : Node or str, optional
+            The parent node of the node, or its ID. If not specified, a new node will be a child of the root node and an existing node keeps its parent. Pass ROOT_ID to move an existing node to the top level.
+
+        Returns
+        -------
+        node : Node
+            The node that was added or updated
+        """
+        updates = {}
+        rows, order, errors = self._node_rows([(node_id, node_type, node_name, node_height, node_width, layer, parent)], updates)
+        if errors:
+            raise ValueError(errors[0][1])
+        if rows:
+            return self._create_nodes(rows, order)[str(node_id)]
+        node = self._index[str(node_id)]
+        self._update_node(node, updates[str(node_id)])
+        return node
+
+    def _update_node(self, node, row: tuple):
+        """
+        Applies a validated row to an existing node, changing only what differs. Returns whether the node changed.
+        """
+        number, node_type, node_name, height, width, layer, parent_id = row
+        attrib = node.attrib
+        changed = False
+        for key, value in (('type', node_type), ('label', node_name), ('layer', None if layer is None else str(layer))):
+            if value is not None and attrib.get(key) != value:
+                self._set(node, key, value)
+                changed = True
+        old_parent_id = self._parent_id(node)
+        if old_parent_id != parent_id:
+            self._set_parent(node, parent_id)
+            self.page.stale.update((old_parent_id, parent_id))
+            self.page.unplaced.add(attrib.get('id'))
+            changed = True
+        if height is not None or width is not None:
+            geometry = self._geometry(node)
+            size = self._size(geometry)
+            new_size = (size[0] if width is None else _number(width), size[1] if height is None else _number(height))
+            if new_size != size:
+                self._resize(geometry, *new_size)
+                self.page.stale.add(parent_id)
+                changed = True
+        if changed:
+            self.page.changed()
+        return changed
+
+    def remove_node(self, node):
+        """
+        Removes a node from the diagram, with all of its descendants and the edges attached to them
+
+        The container of the node is marked for compose_changed, the geometry of its remaining children is left alone.
+
+        Parameters
+        ----------
+        node : Node or str
+            The node to be removed, or its ID
+
+        Returns
+        -------
+        removed : list of str
+            The IDs of the nodes and edges that were removed
+        """
+        node_id = node.attrib.get('id') if isinstance(node, self._node_class) else str(node)
+        element = self._index.get(node_id)
+        if element is None or not self._is_node(element):
+            raise ValueError(f"Node {node_id} not found")
+        return self._remove([element])
+
+    def _remove(self, elements: list):
+        """
+        Removes nodes, with their descendants and the edges attached to them, and edges from the current page. Returns the IDs of the removed elements.
+        """
+        removed = {}
+        stack = []
+        for element in elements:
+            if not self._is_node(element):
+                removed[element.attrib.get('id')] = element
+                continue
+            parent_id = self._parent_id(element)
+            siblings = self._children.get(parent_id)
+            if siblings is not None and element in siblings:
+                siblings.remove(element)
+            self.page.stale.add(parent_id)
+            stack.append(element)
+        while stack:
+            node = stack.pop()
+            node_id = node.attrib.get('id')
+            removed[node_id] = node
+            stack.extend(self._children.pop(node_id, ()))
+            for edges in (self._outgoing, self._incoming):
+                for edge in edges.get(node_id, ()):
+                    removed[edge.attrib.get('id')] = edge
+        for element_id, element in removed.items():
+            self._index.pop(element_id, None)
+            ends = self._edge_ends(element)
+            if ends is not None:
+                self._unindex_edge(element, *ends)
+        self.page.changed()
+        self._discard(removed.values())
+        return list(removed)
+
+    def _unindex_edge(self, edge, source_id: str, target_id: str):
+        """
+        Drops an edge from the edge indexes
+        """
+        for edges, node_id in ((self._outgoing, source_id), (self._incoming, target_id)):
+            attached = edges.get(node_id)
+            if attached is not None and edge in attached:
+                attached.remove(edge)
+                if not attached:
+                    del edges[node_id]
+
+    def aggregate_edges(self, types: list = None, label: str = "{count}"):
+        """
+        Collapses the edges running between the same two nodes or containers of the current page into a single edge labeled with their count
+
+        The ends of every edge are first lifted to the nearest of the node itself and its ancestors whose type is in types. Edges whose lifted ends are the same are then replaced by one edge between the lifted ends, so that parallel edges, fan-outs into a container and edges between the contents of two containers are drawn once. Edges whose ends lift to the same node, and edges that are alone and were not lifted, are left as they are.
+
+        Collapsing edges keep the number of edges they replace and their distinct names in their aggregated and aggregated_names attributes, so aggregating a page again counts the original edges.
+
+        Parameters
+        ----------
+        types : list of str, optional
+            The types of the containers the ends of edges are lifted to. If not specified, only parallel edges between the same two nodes are collapsed.
+        label : str, optional
+            The label of the collapsing edges, formatted with count, the number of edges collapsed, and names, the distinct names of those edges joined with commas. Default "{count}"
+
+        Returns
+        -------
+        edges : list of Edge
+            The edges that replaced collapsed edges
+        """
+        types = set(types or ())
+        lifted = {}
+        groups = {}
+        # groups with at least one lifted end, which are collapsed even when they hold a single edge
+        moved = set()
+        for source_id, edges in self._outgoing.items():
+            source = (self._lift(source_id, types, lifted) if types else None) or source_id
+            for edge in edges:
+                target_id = self._edge_ends(edge)[1]
+                if target_id is None:
+                    continue
+                target = (self._lift(target_id, types, lifted) if types else None) or target_id
+                if source != target:
+                    groups.setdefault((source, target), []).append(edge)
+                    if source != source_id or target != target_id:
+                        moved.add((source, target))
+        collapsed = []
+        rows = {}
+        # the number of original edges and their names, by collapsing edge
+        totals = {}
+        for (source_id, target_id), edges in groups.items():
+            if len(edges) == 1 and (source_id, target_id) not in moved:
+                continue
+            count = 0
+            names = {}
+            for edge in edges:
+                aggregated = edge.get('aggregated')
+                if aggregated is not None:
+                    # an edge collapsed by an earlier aggregation
+                    count += int(aggregated)
+                    names.update(dict.fromkeys(json.loads(edge.get('aggregated_names') or '[]')))
+                    continue
+                count += 1
+                name = edge.get('label', edge.get('value'))
+                if name:
+                    names[name] = None
+            collapsed.extend(edges)
+            edge_id = f"{source_id}-{target_id}"
+            rows[edge_id] = (source_id, target_id, label.format(count=count, names=", ".join(names)))
+            totals[edge_id] = (count, list(names))
+        if not rows:
+            return []
+        self._remove(collapsed)
+        created = self._create_edges(rows)
+        for edge_id, (count, names) in totals.items():
+            self._set(created[edge_id], 'aggregated', str(count))
+            if names:
+                self._set(created[edge_id], 'aggregated_names', json.dumps(names))
+        return list(created.values())
+
+    def _lift(self, node_id: str, types: set, lifted: dict):
+        """
+        Returns the ID of the nearest of a node and its ancestors whose type is in types, or None, memoizing the answers for the ancestors in lifted
+        """
+        chain = []
+        while node_id not in lifted:
+            node = self._index.get(node_id)
+            if node is None or not self._is_node(node):
+                lifted[node_id] = None
+            elif node.attrib.get('type') in types:
+                lifted[node_id] = node_id
+            else:
+                chain.append(node_id)
+                node_id = self._parent_id(node)
+        ancestor = lifted[node_id]
+        for node_id in chain:
+            lifted[node_id] = ancestor
+        return ancestor
+
+    def sync(self, nodes = (), edges = (), remove: bool = False, layout: dict = None, compose: bool = True, **defaults):
+        """
+        Brings the current page in line with a set of nodes and edges, changing only the elements that differ
+
+        Nodes and edges are matched with the elements of the page by ID, edges by the source-target ID given to them by add_edge. New nodes and edges are added, and existing ones whose type, name, layer, parent, size or name differ are updated in place. Existing nodes keep their position, and their size unless one is given, so hand-positioned nodes stay where they are. Only the containers whose children changed are composed again, with the new nodes and the nodes moved to another container laid out below the existing children, see compose_changed. Every record is looked up by ID, so without remove the cost of a sync follows the size of the batch and the number of changes, not the size of the page.
+
+        The whole batch is validated before anything is changed, and all problems are reported together.
+
+        Parameters
+        ----------
+        nodes : iterable, optional
+            The nodes, in any format accepted by add_nodes. The sizes, layer and parent that are not given are kept for existing nodes, ROOT_ID moves an existing node to the top level.
+        edges : iterable, optional
+            The edges, in any format accepted by add_edges. Existing edges keep their name unless one is given.
+        remove : bool, optional
+            If true, the nodes and edges of the current page that are not in the batch are removed, along with the descendants of removed nodes and the edges attached to them. Default False
+        layout : dict, optional
+            Layout options per node type or node ID for the containers that are composed again, see compose_all
+        compose : bool, optional
+            If false, changed containers are only marked, to be composed later with compose_changed. Default True
+        **defaults
+            compose_children keyword arguments applied to every container composed again, unless overridden in layout.
+
+        Returns
+        -------
+        result : SyncResult
+            The IDs of the added, updated and removed nodes and edges
+
+        Raises
+        ------
+        BatchError
+            If any node or edge of the batch is invalid. The diagram is not changed in that case.
+        """
+        node_updates = {}
+        rows, order, node_errors = self._node_rows(nodes, node_updates, remove)
+        removed = []
+        removed_nodes = set()
+        if remove:
+            for element_id, element in self._index.items():
+                if self._is_node(element) and element_id not in rows and element_id not in node_updates:
+                    removed.append(element)
+                    removed_nodes.add(element_id)
+        edge_updates = {}
+        edge_rows, edge_errors = self._edge_rows(edges, edge_updates, rows, removed_nodes)
+        errors = [f"Node row {number}: {error}" for number, error in node_errors]
+        errors.extend(f"Edge row {number}: {error}" for number, error in edge_errors)
+        if errors:
+            raise BatchError(errors)
+        if remove:
+            removed.extend(
+                element for element_id, element in self._index.items()
+                if element_id not in edge_rows and element_id not in edge_updates and self._edge_ends(element) is not None
+            )
+
+        added = list(self._create_nodes(rows, order)) if rows else []
+        updated = [node_id for node_id, row in node_updates.items() if self._update_node(self._index[node_id], row)]
+        # nodes are moved out of removed containers before the containers are removed
+        removed = self._remove(removed) if removed else []
+        if edge_rows:
+            added.extend(self._create_edges(edge_rows))
+        for edge_id, (source, target, name) in edge_updates.items():
+            edge = self._index[edge_id]
+            if name is not None and edge.attrib.get('label') != name:
+                self._set(edge, 'label', name)
+                self.page.changed()
+                updated.append(edge_id)
+        if compose:
+            self.compose_changed(layout, **defaults)
+        return SyncResult(added, updated, removed)
+
     def compose_children(self, parent: ET.Element, cell_padding:int=20, text_padding:int=40, width:int=None, height:int=None, orientation:str="landscape", sorted:bool=False, hpack:bool=False, vpack:bool=False):
         """
         Composes the children of an explicitly specified parent node into a grid.
@@ -221,95 +1066,35 @@ class Diagram:
         -------
         None
         """
-        contents = [node for node in self.diagroot if node.tag == "object" and node.find('mxCell').attrib.get('parent',None) == parent.attrib.get('id')]
+        self.page.stale.discard(parent.attrib.get('id'))
+        contents = list(self._children.get(parent.attrib.get('id'), []))
         if len(contents) == 0:
             return
+        self.page.unplaced.difference_update(content.attrib.get('id') for content in contents)
+        self.page.changed()
         if sorted:
             contents.sort(key=lambda x: (x.attrib.get('type'), x.attrib.get('label', None)))
         # for x in contents:
         #     print(x.attrib.get('type'))
         #     print(x.attrib.get('label'))
-        content_heights = [int(content.find('mxCell').find('mxGeometry').attrib.get('height')) for content in contents]
-        content_widths = [int(content.find('mxCell').find('mxGeometry').attrib.get('width')) for content in contents]
-        content_max_height = max(content_heights)
-        content_max_width = max(content_widths)
-        if orientation not in ["landscape", "portrait"]:
-            raise ValueError("Orientation must be landscape or portrait")
-        if width is not None and height is not None:
-            raise ValueError("Cannot specify both width and height")
-        if hpack and vpack:
-            raise ValueError("Cannot specify both hpack and vpack")
-        if vpack:
-            grid_x = 1
-            grid_y = len(contents)
-        elif hpack:
-            grid_x = len(contents)
-            grid_y = 1
-        else:
-            if width is None and height is None and orientation == "landscape":
-                grid_x = ceil(sqrt(len(contents)))
-                grid_y = ceil(len(contents) / grid_x)
-            elif width is None and height is None and orientation == "portrait":
-                grid_y = ceil(sqrt(len(contents)))
-                grid_x = ceil(len(contents) / grid_y)
-            elif width is not None and height is None:
-                grid_x = width
-                grid_y = ceil(len(contents) / width)
-            elif width is None and height is not None:
-                grid_x = ceil(len(contents) / height)
-                grid_y = height
-
-        parent_width = max(
-            int(parent.find('mxCell').find('mxGeometry').get('width')),
-            cell_padding + ((content_max_width + cell_padding) * grid_x)
+        geometries = [self._geometry(content) for content in contents]
+        sizes = [self._size(geometry) for geometry in geometries]
+        parent_geometry = self._geometry(parent)
+        parent_width, parent_height, xs, ys = grid_layout(
+            [size[0] for size in sizes],
+            [size[1] for size in sizes],
+            *self._size(parent_geometry),
+            cell_padding=cell_padding,
+            text_padding=text_padding,
+            width=width,
+            height=height,
+            orientation=orientation,
+            hpack=hpack,
+            vpack=vpack,
         )
-        parent.find('mxCell').find('mxGeometry').set('width', str(parent_width))
-
-
-        parent_height = max(
-            int(parent.find('mxCell').find('mxGeometry').get('height')),
-            text_padding + ((content_max_height + text_padding) * grid_y)
-        )
-        parent.find('mxCell').find('mxGeometry').set('height', str(parent_height))
-
-        if hpack:
-            parent_width = sum(content_widths) + (cell_padding * (len(content_widths)+1))
-            parent.find('mxCell').find('mxGeometry').set('width', str(parent_width))
-            current_width = cell_padding
-            for element, content in enumerate(contents):
-                element_x = current_width
-                content.find('mxCell').find('mxGeometry').set('x', str(element_x))
-                current_width = current_width + int(content.find('mxCell').find('mxGeometry').get('width')) + cell_padding
-
-        if vpack:
-            parent_height = sum(content_heights) + (text_padding * (len(content_heights)+1))
-            parent.find('mxCell').find('mxGeometry').set('height', str(parent_height))
-            current_height = text_padding
-            for element, content in enumerate(contents):
-                element_y = current_height
-                content.find('mxCell').find('mxGeometry').set('y', str(element_y))
-                current_height = current_height + int(content.find('mxCell').find('mxGeometry').get('height')) + text_padding
-
-        width_pad = (parent_width - (grid_x * content_max_width))/(grid_x+1)
-        height_pad = (parent_height - (grid_y * content_max_height))/(grid_y+1)
-        for element, content in enumerate(contents):
-            if not hpack:
-                element_x = (
-                    width_pad 
-                    + ((element % grid_x) * (content_max_width + width_pad)) 
-                    + ((content_max_width) / 2)
-                    - (int(content.find('mxCell').find('mxGeometry').get('width')) / 2)
-                )
-                content.find('mxCell').find('mxGeometry').set('x', str(element_x))
-            if not vpack:
-                element_y = (
-                    height_pad
-                    + ((element // grid_x) * (content_max_height + height_pad))
-                    + ((content_max_height) / 2)
-                    - (int(content.find('mxCell').find('mxGeometry').get('height')) / 2)
-                )
-                content.find('mxCell').find('mxGeometry').set('y', str(element_y))
-
+        self._resize(parent_geometry, parent_width, parent_height)
+        for geometry, x, y in zip(geometries, xs, ys):
+            self._move(geometry, x, y)
 
     def compose_parents(self, parent_types: list, cell_padding:int=20, text_padding:int=40, width:int=None, height:int=None, orientation:str="landscape"):
         """
@@ -334,27 +1119,321 @@ class Diagram:
         -------
         None
         """
-        parents = [node for node in self.diagroot if node.tag == "object" and node.attrib.get('type') in parent_types]
+        parents = [node for node in self._index.values() if node.tag == "object" and node.attrib.get('type') in parent_types]
         for parent in parents:
             self.compose_children(parent, cell_padding, text_padding, width, height, orientation)
 
+    def compose_all(self, layout: dict = None, parent: ET.Element = None, layouts: dict = None, **defaults):
+        """
+        Composes every container of the current page into a grid in a single bottom-up pass.
+
+        Containers are composed after all of their descendants, as if compose_children had been called on each of them in reverse nesting order. Geometry is read from the XML once, laid out in memory and written back once at the end.
+
+        Parameters
+        ----------
+        layout : dict, optional
+            Layout options per node type or node ID. Maps a type or ID to a dict of compose_children keyword arguments (cell_padding, text_padding, width, height, orientation, sorted, hpack, vpack). Options given for a node ID take precedence over options given for its type.
+        parent : Node, optional
+            The topmost container to be composed. If not specified, every container of the current page will be composed.
+        layouts : dict, optional
+            Laid out subtrees from earlier compositions, see py2drawio.layout.layout_tree. Containers whose subtree, with the same sizes and options, is found in it are not laid out again, and every composed container is stored in it.
+        **defaults
+            compose_children keyword arguments applied to every container, unless overridden in layout.
+
+        Returns
+        -------
+        None
+        """
+        layout_input, geometries = self._layout_input(layout, parent, defaults)
+        self._apply_layout(geometries, *_layout_page(*layout_input, layouts))
+
+    def compose_pages(self, layout: dict = None, pages: list = None, workers: int = None, **defaults):
+        """
+        Composes every container of several pages, as compose_all does for the current page
+
+        Pages are laid out independently of each other, so they can be laid out in parallel worker processes. Only the numeric layout runs in the workers, geometry is read from and written back to the pages in the calling process.
+
+        Parameters
+        ----------
+        layout : dict, optional
+            Layout options per node type or node ID, see compose_all. Options are applied on every page.
+        pages : list of str, optional
+            The names of the pages to be composed. If not specified, every page will be composed.
+        workers : int, optional
+            The number of worker processes laying out pages. If not specified, pages are laid out one after the other in the calling process.
+        **defaults
+            compose_children keyword arguments applied to every container, unless overridden in layout.
+
+        Returns
+        -------
+        None
+        """
+        current = self.page
+        pages = [self.pages[name] for name in pages] if pages is not None else list(self.pages.values())
+        inputs = []
+        try:
+            for page in pages:
+                self.select_page(page)
+                inputs.append(self._layout_input(layout, None, defaults))
+            if workers is None or workers <= 1 or len(pages) <= 1:
+                results = (_layout_page(*layout_input) for layout_input, _ in inputs)
+                for page, (_, geometries), result in zip(pages, inputs, results):
+                    self.select_page(page)
+                    self._apply_layout(geometries, *result)
+            else:
+                # imported here so that importing py2drawio does not load multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(min(workers, len(pages))) as pool:
+                    results = pool.map(_layout_page, *zip(*[layout_input for layout_input, _ in inputs]))
+                    for page, (_, geometries), result in zip(pages, inputs, results):
+                        self.select_page(page)
+                        self._apply_layout(geometries, *result)
+        finally:
+            self.select_page(current)
+
+    def _layout_input(self, layout: dict, parent: ET.Element, defaults: dict):
+        """
+        Reads the tree of containers of the current page below parent, or of the whole page, as the numeric input of layout_tree
+
+        Returns the (roots, children, sizes, options) arguments of layout_tree and the geometries of the nodes by ID.
+        """
+        if parent is None:
+            roots = [
+                child for parent_id, contents in self._children.items()
+                if parent_id not in self._index or self._index[parent_id].tag != "object"
+                for child in contents
+            ]
+        else:
+            roots = [parent]
+        children = {}
+        sizes = {}
+        options = {}
+        geometries = {}
+        stack = list(roots)
+        while stack:
+            node = stack.pop()
+            node_id = node.attrib.get('id')
+            geometry = geometries[node_id] = self._geometry(node)
+            sizes[node_id] = list(self._size(geometry))
+            contents = self._children.get(node_id)
+            if not contents:
+                continue
+            node_options = self._options(layout, node, defaults)
+            if node_options.pop('sorted', False):
+                contents = sorted(contents, key=lambda x: (x.attrib.get('type'), x.attrib.get('label', None)))
+            children[node_id] = [content.attrib.get('id') for content in contents]
+            options[node_id] = node_options
+            stack.extend(contents)
+        return ([root.attrib.get('id') for root in roots], children, sizes, options), geometries
+
+    def _apply_layout(self, geometries: dict, positions: dict, sizes: dict):
+        """
+        Writes the result of layout_tree back to the geometries of the nodes of the current page
+        """
+        self.page.changed()
+        self.page.stale.difference_update(sizes)
+        self.page.unplaced.difference_update(positions)
+        for node_id, size in sizes.items():
+            self._resize(geometries[node_id], *size)
+        for node_id, (x, y) in positions.items():
+            self._move(geometries[node_id], x, y)
+
+    def _options(self, layout: dict, node, defaults: dict):
+        """
+        Returns the compose_children keyword arguments of a container, from the defaults and the options given for its type and ID in layout
+        """
+        options = dict(defaults)
+        if layout:
+            options.update(layout.get(node.attrib.get('type'), {}))
+            options.update(layout.get(node.attrib.get('id'), {}))
+        return options
+
+    def compose_changed(self, layout: dict = None, **defaults):
+        """
+        Composes again only the containers of the current page whose children changed since they were last composed
+
+        Adding, removing, moving or resizing a node marks its container, and composing a container clears its mark. Marked containers are handled innermost first. A container whose children are all new is composed as by compose_children. Otherwise its existing children stay where they are: the nodes added to or moved into it are laid out in a grid of their own below them, and the container is enlarged to fit its children. Ancestors are not composed again either, they are only enlarged when a container no longer fits in them.
+
+        Parameters
+        ----------
+        layout : dict, optional
+            Layout options per node type or node ID, see compose_all
+        **defaults
+            compose_children keyword arguments applied to every container, unless overridden in layout.
+
+        Returns
+        -------
+        None
+        """
+        containers = {}
+        for node_id in self.page.stale:
+            node = self._index.get(node_id)
+            if node is not None and self._is_node(node):
+                containers[node_id] = node
+        self.page.stale.clear()
+        depths = {}
+        unplaced = self.page.unplaced
+        for node_id, node in sorted(containers.items(), key=lambda item: self._depth(item[0], depths), reverse=True):
+            del containers[node_id]
+            options = self._options(layout, node, defaults)
+            contents = self._children.get(node_id, [])
+            placed = [content for content in contents if content.attrib.get('id') not in unplaced]
+            if not placed:
+                self.compose_children(node, **options)
+            else:
+                self._place(placed, [content for content in contents if content.attrib.get('id') in unplaced], **options)
+                self._fit(node, **options)
+            while True:
+                parent = self._index.get(self._parent_id(node))
+                if parent is None or not self._is_node(parent) or parent.attrib.get('id') in containers:
+                    break
+                if not self._fit(parent, **self._options(layout, parent, defaults)):
+                    break
+                node = parent
+        # the nodes left are top-level nodes, which are never composed
+        unplaced.clear()
+
+    def _depth(self, node_id: str, depths: dict):
+        """
+        Returns the nesting depth of a node, memoizing the depths of its ancestors in depths
+        """
+        chain = []
+        while node_id not in depths:
+            node = self._index.get(node_id)
+            if node is None or not self._is_node(node):
+                depths[node_id] = 0
+            else:
+                chain.append(node_id)
+                node_id = self._parent_id(node)
+        depth = depths[node_id]
+        for node_id in reversed(chain):
+            depth += 1
+            depths[node_id] = depth
+        return depth
+
+    def _place(self, placed: list, contents: list, **options):
+        """
+        Lays out new children of a container in a grid of their own below its existing children, without moving the existing children
+        """
+        if not contents:
+            return
+        self.page.changed()
+        if options.pop('sorted', False):
+            contents = sorted(contents, key=lambda x: (x.attrib.get('type'), x.attrib.get('label', None)))
+        top = 0
+        for content in placed:
+            geometry = self._geometry(content)
+            top = max(top, self._position(geometry)[1] + self._size(geometry)[1])
+        geometries = [self._geometry(content) for content in contents]
+        sizes = [self._size(geometry) for geometry in geometries]
+        _, _, xs, ys = grid_layout([size[0] for size in sizes], [size[1] for size in sizes], 0, 0, **options)
+        for geometry, content, x, y in zip(geometries, contents, xs, ys):
+            self._move(geometry, x, top + y)
+            self.page.unplaced.discard(content.attrib.get('id'))
+
+    def _fit(self, node, cell_padding: int = 20, text_padding: int = 40, **options):
+        """
+        Enlarges a container so that its children fit in it with the given padding, without moving them. Returns whether the container was resized.
+        """
+        contents = self._children.get(node.attrib.get('id'))
+        if not contents:
+            return False
+        right = bottom = 0
+        for content in contents:
+            geometry = self._geometry(content)
+            x, y = self._position(geometry)
+            width, height = self._size(geometry)
+            right = max(right, x + width)
+            bottom = max(bottom, y + height)
+        geometry = self._geometry(node)
+        size = self._size(geometry)
+        fitted = (max(size[0], ceil(right + cell_padding)), max(size[1], ceil(bottom + text_padding)))
+        if fitted == size:
+            return False
+        self.page.changed()
+        self._resize(geometry, *fitted)
+        return True
+
     # def get_grid_size(self, elements:int):
     #     cols = ceil(sqrt(elements))
     #     rows = ceil(elements / cols)
     #     return (cols, rows)
     
-    def write(self, filename=None):
+    def write(self, filename=None, compressed = False, gzip: bool = False, cache: bool = False):
         """
         Writes the diagram to a draw.io file
 
+        The diagram is streamed to the output one page at a time, so file-like objects wrapping sockets or pipes receive data as it is serialized. Pages that were serialized by serialize_page, or by an earlier write with cache set, and have not changed since are copied from their cached serialization instead of being serialized again.
+
         Parameters
         ----------
-        filename : str, optional
-            The filename of the draw.io file to be written. If not specified, the filename specified in the constructor will be used. If no filename was specified in the constructor, a ValueError will be raised.
+        filename : str or file-like, optional
+            The filename of the draw.io file to be written, or a binary file-like object to write to. If not specified, the filename specified in the constructor will be used. If no filename was specified in the constructor, a ValueError will be raised.
+        compressed : bool or list of str, optional
+            If true, pages are written as draw.io's native compressed payload (raw deflate and base64). If a list of page names, only those pages are compressed. Default False
+        gzip : bool, optional
+            If true, the whole output is gzipped. Default False
+        cache : bool, optional
+            If true, the serialization of every page is kept in memory and reused by later writes for as long as the page does not change. Default False
         """
         if filename is None:
             if self.filename is None:
                 raise ValueError("No filename specified")
             else:
                 filename = self.filename
-        ET.ElementTree(self.root).write(filename)
\ No newline at end of file
+        with ExitStack() as stack:
+            if hasattr(filename, 'write'):
+                out = filename
+            else:
+                out = stack.enter_context(open(filename, 'wb'))
+            if gzip:
+                out = stack.enter_context(GzipFile(fileobj=out, mode='wb'))
+            if isinstance(compressed, (list, tuple, set, frozenset)):
+                compressed = {self.pages[name].element for name in compressed}
+            else:
+                compressed = bool(compressed)
+            extra = {}
+            serialized = {}
+            for page in self.pages.values():
+                page_compressed = compressed if isinstance(compressed, bool) else page.element in compressed
+                if cache:
+                    serialized[page.element] = self.serialize_page(page, page_compressed)
+                elif page._serialized is not None and page._serialized[0] == page_compressed:
+                    serialized[page.element] = page._serialized[1]
+                else:
+                    extra[page.element] = self._cells(page)
+            write_mxfile(self.root, out, compressed, extra, serialized)
+
+    def serialize_page(self, page = None, compressed: bool = False):
+        """
+        Serializes a single page as the diagram element written to draw.io files
+
+        The serialization is cached, and reused by later calls and by write for as long as the page does not change.
+
+        Parameters
+        ----------
+        page : str or Page, optional
+            The name of the page, or the page itself. If not specified, the current page is serialized.
+        compressed : bool, optional
+            If true, the content of the page is serialized as draw.io's native compressed payload. Default False
+
+        Returns
+        -------
+        xml : bytes
+            The ASCII encoded diagram element of the page
+        """
+        if page is None:
+            page = self.page
+        elif not isinstance(page, Page):
+            page = self.pages[page]
+        if page._serialized is None or page._serialized[0] != compressed:
+            out = BytesIO()
+            write_page(page.element, out, compressed, self._cells(page))
+            page._serialized = (compressed, out.getvalue())
+        return page._serialized[1]
+
+    def _cells(self, page: Page):
+        """
+        Returns the cells of a page to be streamed after the elements of its root when it is written, or None if every cell is in its root
+        """
+        return None
\ No newline at end of file
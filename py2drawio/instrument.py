@@ -0,0 +1,223 @@
+from collections import namedtuple
+from functools import wraps
+from time import perf_counter
+
+Event = namedtuple('Event', ['phase', 'seconds', 'details'])
+Event.__doc__ = """
+A timed call of an instrumented diagram, as passed to the hooks of Stats
+
+Attributes
+----------
+phase : str
+    The name of the phase, such as template, add_node, compose_children or write
+seconds : float
+    The wall time of the call
+details : dict or None
+    Phase specific details, such as the container ID and child count of a compose_children call
+"""
+
+# Methods of Diagram timed as phases, with the function giving the details of a call from the diagram and its arguments
+PHASES = {
+    'add_node': None,
+    'add_nodes': lambda diagram, nodes, *args, **kwargs: {'count': len(nodes) if hasattr(nodes, '__len__') else None},
+    'add_edge': None,
+    'add_edges': lambda diagram, edges, *args, **kwargs: {'count': len(edges) if hasattr(edges, '__len__') else None},
+    'upsert_node': None,
+    'remove_node': None,
+    'sync': None,
+    'aggregate_edges': None,
+    'compose_children': lambda diagram, parent, *args, **kwargs: {
+        'container': parent.attrib.get('id'),
+        'children': len(diagram._children.get(parent.attrib.get('id'), ())),
+    },
+    'compose_parents': None,
+    'compose_all': None,
+    'compose_pages': None,
+    'compose_changed': None,
+    'write': None,
+}
+# Methods of Diagram counted, with the name of their counter
+COUNTERS = {
+    'get': 'lookups',
+    'edges_of': 'lookups',
+    '_geometry': 'lookups',
+    '_parent_id': 'lookups',
+    '_is_node': 'lookups',
+    '_set': 'lookups',
+    '_edge_ends': 'lookups',
+    '_node_element': 'elements',
+    '_edge_element': 'elements',
+}
+
+
+class Stats:
+    """
+    Timings and counters collected by an instrumented diagram
+
+    Stats can be shared by several diagrams, which then add up their figures.
+
+    Attributes
+    ----------
+    timings : dict
+        Maps every phase to a dict with its number of calls and total seconds
+    counters : dict
+        Maps lookups, the number of node lookups by ID, edge lookups by node and cell lookups behind the geometries, parents, types and ends of nodes and edges, and elements, the number of node and edge elements created, to their counts
+    containers : list of tuple
+        (container ID, child count, seconds) of every compose_children call
+    """
+    def __init__(self):
+        self.timings = {}
+        self.counters = {'lookups': 0, 'elements': 0}
+        self.containers = []
+        self._hooks = []
+
+    def subscribe(self, hook):
+        """
+        Registers a callback called with an Event after every timed call
+
+        Parameters
+        ----------
+        hook : callable
+            The callback, called with the Event of each call
+
+        Returns
+        -------
+        None
+        """
+        self._hooks.append(hook)
+
+    def unsubscribe(self, hook):
+        """
+        Removes a callback registered with subscribe
+        """
+        self._hooks.remove(hook)
+
+    def record(self, phase: str, seconds: float, details: dict = None):
+        """
+        Records a timed call and passes it on to the hooks
+
+        Parameters
+        ----------
+        phase : str
+            The name of the phase
+        seconds : float
+            The wall time of the call
+        details : dict, optional
+            Phase specific details of the call
+
+        Returns
+        -------
+        None
+        """
+        timing = self.timings.get(phase)
+        if timing is None:
+            timing = self.timings[phase] = {'calls': 0, 'seconds': 0.0}
+        timing['calls'] += 1
+        timing['seconds'] += seconds
+        if phase == 'compose_children' and details is not None:
+            self.containers.append((details['container'], details['children'], seconds))
+        if self._hooks:
+            event = Event(phase, seconds, details)
+            for hook in self._hooks:
+                hook(event)
+
+    def timed(self, phase: str, function, details=None):
+        """
+        Wraps a function so that every call is recorded as a phase
+
+        Parameters
+        ----------
+        phase : str
+            The name of the phase
+        function : callable
+            The function to be timed
+        details : callable, optional
+            Called with the arguments of each call, before the call, returns the details of the call. If it fails, the call is recorded without details.
+
+        Returns
+        -------
+        timed : callable
+            The wrapped function
+        """
+        record = self.record
+
+        @wraps(function)
+        def timed(*args, **kwargs):
+            call_details = None
+            if details is not None:
+                try:
+                    call_details = details(*args, **kwargs)
+                except Exception:
+                    # invalid arguments are reported by the call itself
+                    pass
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(phase, perf_counter() - start, call_details)
+        return timed
+
+    def counted(self, counter: str, function):
+        """
+        Wraps a function so that every call increments a counter
+        """
+        counters = self.counters
+
+        @wraps(function)
+        def counted(*args, **kwargs):
+            counters[counter] += 1
+            return function(*args, **kwargs)
+        return counted
+
+    def as_dict(self):
+        """
+        Returns the collected figures as plain data, for exporters
+
+        Returns
+        -------
+        stats : dict
+            The timings, counters and containers of the stats
+        """
+        return {
+            'timings': {phase: dict(timing) for phase, timing in self.timings.items()},
+            'counters': dict(self.counters),
+            'containers': [list(container) for container in self.containers],
+        }
+
+    def reset(self):
+        """
+        Clears the collected figures, keeping the hooks
+        """
+        self.timings.clear()
+        for counter in self.counters:
+            self.counters[counter] = 0
+        self.containers.clear()
+
+
+def instrument(diagram, stats: Stats):
+    """
+    Instruments a diagram, shadowing its timed and counted methods with wrappers recording to stats
+
+    Diagrams that are not instrumented run their methods unwrapped, so instrumentation costs nothing when it is disabled.
+
+    Parameters
+    ----------
+    diagram : Diagram
+        The diagram to be instrumented
+    stats : Stats
+        The stats the diagram records to
+
+    Returns
+    -------
+    None
+    """
+    for name, details in PHASES.items():
+        if details is not None:
+            details = _bind(details, diagram)
+        setattr(diagram, name, stats.timed(name, getattr(diagram, name), details))
+    for name, counter in COUNTERS.items():
+        setattr(diagram, name, stats.counted(counter, getattr(diagram, name)))
+
+
+def _bind(details, diagram):
+    return lambda *args, **kwargs: details(diagram, *args, **kwargs)
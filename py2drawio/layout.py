@@ -0,0 +1,201 @@
+import json
+from hashlib import sha256
+from importlib.util import find_spec
+from math import ceil,sqrt
+
+# numpy is optional and only imported the first time a large container is placed
+HAS_NUMPY = find_spec("numpy") is not None
+
+# Containers with at least this many children are placed with numpy, when it is installed
+VECTORIZE_THRESHOLD = 1000
+
+
+def grid_layout(widths: list, heights: list, parent_width: int, parent_height: int, cell_padding:int=20, text_padding:int=40, width:int=None, height:int=None, orientation:str="landscape", hpack:bool=False, vpack:bool=False, vectorize:bool=None):
+    """
+    Computes the placement of the children of a single container as numbers, without touching any XML.
+
+    This is the grid algorithm used by Diagram.compose_children, see that method for the meaning of the layout options.
+
+    Parameters
+    ----------
+    widths : list of int
+        The widths of the children, in order
+    heights : list of int
+        The heights of the children, in order
+    parent_width : int
+        The current width of the container
+    parent_height : int
+        The current height of the container
+    vectorize : bool, optional
+        If true, computes the coordinates with batched numpy array operations. If not specified, numpy is used for containers with at least VECTORIZE_THRESHOLD children. Falls back to pure python when numpy is not installed. Both paths give exactly the same results.
+
+    Returns
+    -------
+    parent_width : int
+        The new width of the container
+    parent_height : int
+        The new height of the container
+    xs : list
+        The x coordinate of every child
+    ys : list
+        The y coordinate of every child
+    """
+    content_max_height = max(heights)
+    content_max_width = max(widths)
+    if orientation not in ["landscape", "portrait"]:
+        raise ValueError("Orientation must be landscape or portrait")
+    if width is not None and height is not None:
+        raise ValueError("Cannot specify both width and height")
+    if hpack and vpack:
+        raise ValueError("Cannot specify both hpack and vpack")
+    count = len(widths)
+    if vpack:
+        grid_x = 1
+        grid_y = count
+    elif hpack:
+        grid_x = count
+        grid_y = 1
+    else:
+        if width is None and height is None and orientation == "landscape":
+            grid_x = ceil(sqrt(count))
+            grid_y = ceil(count / grid_x)
+        elif width is None and height is None and orientation == "portrait":
+            grid_y = ceil(sqrt(count))
+            grid_x = ceil(count / grid_y)
+        elif width is not None and height is None:
+            grid_x = width
+            grid_y = ceil(count / width)
+        elif width is None and height is not None:
+            grid_x = ceil(count / height)
+            grid_y = height
+
+    parent_width = max(parent_width, cell_padding + ((content_max_width + cell_padding) * grid_x))
+    parent_height = max(parent_height, text_padding + ((content_max_height + text_padding) * grid_y))
+
+    if vectorize is None:
+        vectorize = count >= VECTORIZE_THRESHOLD
+    if hpack:
+        parent_width = sum(widths) + (cell_padding * (count+1))
+    if vpack:
+        parent_height = sum(heights) + (text_padding * (count+1))
+    width_pad = (parent_width - (grid_x * content_max_width))/(grid_x+1)
+    height_pad = (parent_height - (grid_y * content_max_height))/(grid_y+1)
+    if vectorize and HAS_NUMPY:
+        place = _place_numpy
+    else:
+        place = _place_python
+    xs = place(widths, cell_padding, hpack, width_pad, content_max_width, lambda element: element % grid_x)
+    ys = place(heights, text_padding, vpack, height_pad, content_max_height, lambda element: element // grid_x)
+    return parent_width, parent_height, xs, ys
+
+
+def _place_python(sizes: list, padding: int, pack: bool, pad: float, max_size: int, slot):
+    """
+    Computes the coordinates of children along one axis, one child at a time
+    """
+    if pack:
+        coordinates = []
+        current = padding
+        for size in sizes:
+            coordinates.append(current)
+            current = current + size + padding
+        return coordinates
+    return [
+        pad
+        + (slot(element) * (max_size + pad))
+        + ((max_size) / 2)
+        - (size / 2)
+        for element, size in enumerate(sizes)
+    ]
+
+
+def _place_numpy(sizes: list, padding: int, pack: bool, pad: float, max_size: int, slot):
+    """
+    Computes the coordinates of children along one axis with batched numpy array operations
+
+    The operations are applied in the same order as in _place_python, so the results are identical. Packed coordinates are only vectorized when every size and the padding are integers, other values are placed by _place_python so that they keep their python types.
+    """
+    import numpy
+    values = numpy.asarray(sizes)
+    if pack:
+        if values.dtype.kind not in 'iu' or not isinstance(padding, int):
+            return _place_python(sizes, padding, pack, pad, max_size, slot)
+        coordinates = numpy.empty(len(values), dtype=numpy.int64)
+        coordinates[0] = padding
+        numpy.cumsum(values[:-1] + padding, out=coordinates[1:])
+        coordinates[1:] += padding
+        return coordinates.tolist()
+    return (
+        pad
+        + (slot(numpy.arange(len(values))) * (max_size + pad))
+        + ((max_size) / 2)
+        - (values / 2)
+    ).tolist()
+
+
+def layout_tree(roots: list, children: dict, sizes: dict, options: dict = None, memo = None):
+    """
+    Lays out a tree of containers bottom-up in a single post-order pass.
+
+    Every container is composed after all of its descendants, so its size accounts for the final size of its children.
+
+    Parameters
+    ----------
+    roots : list of str
+        The IDs of the topmost nodes to be laid out. Roots are composed themselves but not positioned.
+    children : dict
+        Maps a node ID to the ordered list of its child IDs
+    sizes : dict
+        Maps a node ID to a [width, height] list. Container entries are updated in place.
+    options : dict, optional
+        Maps a container ID to the keyword arguments to be passed to grid_layout for it
+    memo : dict, optional
+        Laid out subtrees, keyed by a digest of the sizes and options of the subtree. Containers whose subtree is found in memo are not laid out again, and every laid out container is stored in it. Entries are plain lists, so memo can be saved as JSON.
+
+    Returns
+    -------
+    positions : dict
+        Maps the ID of every laid out child to its (x, y) coordinates
+    """
+    if options is None:
+        options = {}
+    order = []
+    stack = list(roots)
+    while stack:
+        node_id = stack.pop()
+        order.append(node_id)
+        stack.extend(children.get(node_id, ()))
+    positions = {}
+    keys = {}
+    for node_id in reversed(order):
+        contents = children.get(node_id)
+        size = sizes[node_id]
+        if memo is not None:
+            key = keys[node_id] = _subtree_key(size, options.get(node_id), [keys[child] for child in contents] if contents else None)
+        if not contents:
+            continue
+        entry = memo.get(key) if memo is not None else None
+        if entry is None:
+            entry = grid_layout(
+                [sizes[child][0] for child in contents],
+                [sizes[child][1] for child in contents],
+                size[0],
+                size[1],
+                **options.get(node_id, {})
+            )
+        if memo is not None:
+            memo[key] = list(entry)
+        size[0], size[1], xs, ys = entry
+        for child, x, y in zip(contents, xs, ys):
+            positions[child] = (x, y)
+    return positions
+
+
+def _subtree_key(size: list, options: dict, child_keys: list):
+    """
+    Returns the digest of a subtree for layout_tree memos. The layout of a subtree only depends on the initial sizes of its nodes, its shape and the options of its containers.
+    """
+    if child_keys is None:
+        return f"{size[0]},{size[1]}"
+    payload = json.dumps([size, options or {}, child_keys], sort_keys=True, separators=(',', ':'))
+    return sha256(payload.encode()).hexdigest()[:32]
@@ -0,0 +1,243 @@
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from io import StringIO
+from .writer import decompress_diagram
+
+# Node type added to every extracted template, for grouping nodes without a visible container
+BLANK_CONTAINER = {
+    "style": "fillColor=none;strokeColor=none;dashed=0;verticalAlign=top;fontStyle=0;fontColor=#232F3D;",
+    "width": "130",
+    "height": "130",
+}
+
+LoadedPage = namedtuple('LoadedPage', ['page', 'root', 'index', 'children', 'outgoing', 'incoming'])
+LoadedPage.__doc__ = """
+A page of a loaded draw.io file with its indexes
+
+Attributes
+----------
+page : ET.Element
+    The diagram element of the page
+root : ET.Element
+    The root element holding the cells of the page
+index : dict
+    Maps cell IDs to cells
+children : dict
+    Maps parent IDs to the list of their child nodes
+outgoing : dict
+    Maps node IDs to the list of the edges leaving them
+incoming : dict
+    Maps node IDs to the list of the edges entering them
+"""
+
+
+def index_cell(element: ET.Element, index: dict, children: dict, outgoing: dict, incoming: dict):
+    """
+    Adds a cell to the ID index and, for nodes, to the parent to children index of a page, or for edges, to the edge indexes
+    """
+    element_id = element.attrib.get('id')
+    if element_id is not None:
+        index[element_id] = element
+    mxcell = element.find('mxCell') if element.tag == "object" else element
+    if mxcell is None:
+        return
+    if mxcell.attrib.get('edge') == '1':
+        source = mxcell.attrib.get('source')
+        if source is not None:
+            outgoing.setdefault(source, []).append(element)
+        target = mxcell.attrib.get('target')
+        if target is not None:
+            incoming.setdefault(target, []).append(element)
+    elif element.tag == "object":
+        children.setdefault(mxcell.attrib.get('parent'), []).append(element)
+
+
+def index_cells(root: ET.Element):
+    """
+    Builds the ID index, the parent to children index and the edge indexes of the cells of a page
+
+    Parameters
+    ----------
+    root : ET.Element
+        The root element holding the cells of the page
+
+    Returns
+    -------
+    index : dict
+        Maps cell IDs to cells
+    children : dict
+        Maps parent IDs to the list of their child nodes
+    outgoing : dict
+        Maps node IDs to the list of the edges leaving them
+    incoming : dict
+        Maps node IDs to the list of the edges entering them
+    """
+    index = {}
+    children = {}
+    outgoing = {}
+    incoming = {}
+    for element in root:
+        index_cell(element, index, children, outgoing, incoming)
+    return index, children, outgoing, incoming
+
+
+def _payload(page: ET.Element):
+    """
+    Returns the compressed content of a diagram element, or None if the page is stored as plain XML
+    """
+    if len(page) == 0 and page.text is not None and page.text.strip():
+        return page.text.strip()
+    return None
+
+
+def load(source, pages: list = None):
+    """
+    Loads a draw.io file in a single streaming pass, building the indexes of its pages while it is parsed
+
+    Compressed pages are decoded transparently. Pages that are not selected are kept as they are in the file, compressed pages among them are not decoded at all.
+
+    Parameters
+    ----------
+    source : str or file-like
+        The filename of the draw.io file, or a binary file-like object to read it from
+    pages : list, optional
+        The names or 0-based positions of the pages to be loaded. If not specified, every page will be loaded.
+
+    Returns
+    -------
+    root : ET.Element
+        The mxfile element of the file
+    loaded : list of LoadedPage
+        The selected pages, in file order
+    """
+    root = None
+    loaded = []
+    stack = []
+    position = -1
+    selected = False
+    index = children = outgoing = incoming = None
+    for event, element in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = element
+            stack.append(element)
+            if len(stack) == 2 and element.tag == 'diagram':
+                position += 1
+                selected = pages is None or position in pages or element.attrib.get('name') in pages
+                index = {}
+                children = {}
+                outgoing = {}
+                incoming = {}
+            continue
+        stack.pop()
+        if selected and len(stack) == 4 and stack[-1].tag == 'root':
+            index_cell(element, index, children, outgoing, incoming)
+        elif len(stack) == 1 and element.tag == 'diagram' and selected:
+            payload = _payload(element)
+            if payload is not None:
+                element.text = None
+                element.append(ET.fromstring(decompress_diagram(payload)))
+                index, children, outgoing, incoming = index_cells(element.find('./mxGraphModel/root'))
+            cells = element.find('./mxGraphModel/root')
+            if cells is not None:
+                loaded.append(LoadedPage(element, cells, index, children, outgoing, incoming))
+            selected = False
+    return root, loaded
+
+
+def iter_cells(source):
+    """
+    Streams the mxCell elements of a draw.io file, including those of compressed pages
+
+    Cells are released once they have been consumed, so the whole file is never held in memory.
+
+    Parameters
+    ----------
+    source : str or file-like
+        The filename of the draw.io file, or a file-like object to read it from
+
+    Yields
+    ------
+    mxcell : ET.Element
+        Every mxCell element of the file, in document order
+    """
+    stack = []
+    for event, element in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            stack.append(element)
+            continue
+        stack.pop()
+        if element.tag == 'mxCell':
+            yield element
+        if element.tag == 'diagram':
+            payload = _payload(element)
+            if payload is not None:
+                yield from iter_cells(StringIO(decompress_diagram(payload)))
+            element.clear()
+        elif stack and stack[-1].tag == 'root':
+            stack[-1].remove(element)
+
+
+def harvest_node_types(cells, node_types: dict = None):
+    """
+    Collects a node type for every distinct value of the given mxCell elements, with its style and size
+
+    Parameters
+    ----------
+    cells : iterable of ET.Element
+        The mxCell elements to be harvested
+    node_types : dict, optional
+        Node types already known. Types found in it are not overwritten.
+
+    Returns
+    -------
+    node_types : dict
+        The node types, in the format of the template files
+    """
+    if node_types is None:
+        node_types = {}
+    for node in cells:
+        type = node.attrib.get('value')
+        if type is not None and type not in node_types:
+            width = height = None
+            geometry = node.find('mxGeometry')
+            if geometry is not None:
+                width = geometry.attrib.get('width')
+                height = geometry.attrib.get('height')
+            node_types[type] = {
+                'style': node.attrib.get('style'),
+                'width': width,
+                'height': height
+            }
+    return node_types
+
+
+def save_node_types(node_types: dict, outfile: str):
+    """
+    Saves node types to a template file in yaml format
+    """
+    from yaml import safe_dump
+    with open(outfile, 'w') as f:
+        f.write(safe_dump(node_types, default_flow_style=False))
+
+
+def extract_node_types(source, outfile: str = None):
+    """
+    Extracts the node types from a draw.io file without loading the whole file in memory
+
+    Parameters
+    ----------
+    source : str or file-like
+        The filename of the draw.io file, or a file-like object to read it from
+    outfile : str, optional
+        The filename of the yaml file to be created. If not specified, no file is written.
+
+    Returns
+    -------
+    node_types : dict
+        The extracted node types
+    """
+    node_types = harvest_node_types(iter_cells(source), {"BlankContainer": dict(BLANK_CONTAINER)})
+    if outfile is not None:
+        save_node_types(node_types, outfile)
+    return node_types
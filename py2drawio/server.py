@@ -0,0 +1,424 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+from time import perf_counter
+from .batch import RenderResult, _warm, build
+
+# Largest request body accepted, in bytes
+MAX_BODY = 64 * 1024 * 1024
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    422: "Unprocessable Entity",
+    503: "Service Unavailable",
+}
+
+
+class Overloaded(Exception):
+    """
+    Raised when a render is refused because the queue of the server is full
+    """
+
+
+class Metrics:
+    """
+    Request counters, gauges and latencies of a render server
+
+    Attributes
+    ----------
+    requests : int
+        The number of renders completed, successful or not
+    errors : int
+        The number of renders that failed
+    rejected : int
+        The number of renders refused because the queue was full
+    in_flight : int
+        The number of renders running in the worker pool
+    queued : int
+        The number of renders waiting for a free worker
+    latencies : deque of float
+        The wall time of the most recent renders, from their arrival to their completion, queueing included
+    render_seconds : deque of float
+        The time spent building and writing the most recent diagrams in the workers
+    """
+    def __init__(self, window: int = 1024):
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.queued = 0
+        self.latencies = deque(maxlen=window)
+        self.render_seconds = deque(maxlen=window)
+
+    def as_dict(self):
+        """
+        Returns the metrics as plain data, with percentiles of the recent latencies
+
+        Returns
+        -------
+        metrics : dict
+            The counters and gauges, and count, mean, p50, p95, p99 and max summaries of the latencies and render times in seconds
+        """
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'rejected': self.rejected,
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'latency': _summary(self.latencies),
+            'render': _summary(self.render_seconds),
+        }
+
+
+def _summary(samples):
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    return {
+        'count': len(ordered),
+        'mean': sum(ordered) / len(ordered),
+        'p50': ordered[round(last * 0.5)],
+        'p95': ordered[round(last * 0.95)],
+        'p99': ordered[round(last * 0.99)],
+        'max': ordered[-1],
+    }
+
+
+class RenderServer:
+    """
+    A long-running local service rendering diagram specs sent as JSON over HTTP
+
+    Diagrams are built with py2drawio.batch.build, laid out and written in a pool of worker processes that load their templates once, so the event loop keeps accepting requests while diagrams are built. At most max_concurrent renders run at once and at most max_queue wait for a worker, further requests are refused with 503 right away.
+
+    The server answers:
+
+    - POST /render with a JSON spec, see py2drawio.batch.build, returns the draw.io file. Specs cannot have an output, and their template must be an inline template or one of the templates the server was started with, so clients cannot make the server read or write arbitrary files. Failed renders return 422 with the error message as JSON, tracebacks are not sent to clients.
+    - GET /metrics returns the metrics of the server as JSON, see Metrics.as_dict
+    - GET /health returns 200 once the server is started
+
+    Attributes
+    ----------
+    metrics : Metrics
+        The counters, gauges and latencies of the server
+    """
+    def __init__(self, workers: int = None, templates: list = None, max_concurrent: int = None, max_queue: int = 64, window: int = 1024):
+        """
+        Parameters
+        ----------
+        workers : int, optional
+            The number of worker processes. If not specified, one worker per CPU is used. With 0 workers, diagrams are built in a thread of the server process, which is enough for tests but holds the GIL.
+        templates : list of str, optional
+            Template filenames loaded by every worker on start up, in addition to the default template. Specs sent over HTTP can only name these templates.
+        max_concurrent : int, optional
+            The number of renders running at once. If not specified, one per worker.
+        max_queue : int, optional
+            The number of renders waiting for a worker before requests are refused. Default 64
+        window : int, optional
+            The number of recent renders the latency percentiles are computed over. Default 1024
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+        self.templates = [None] + list(templates or [])
+        self.max_concurrent = max_concurrent if max_concurrent is not None else max(1, workers)
+        self.max_queue = max_queue
+        self.metrics = Metrics(window)
+        self._pool = None
+        self._server = None
+        self._slots = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080, path: str = None):
+        """
+        Starts the worker pool and listens for requests
+
+        Parameters
+        ----------
+        host : str, optional
+            The address to listen on. Default 127.0.0.1
+        port : int, optional
+            The TCP port to listen on, 0 to pick a free port. Default 8080
+        path : str, optional
+            The filename of a Unix socket to listen on instead of a TCP port
+
+        Returns
+        -------
+        address : str or tuple
+            The socket path, or the (host, port) the server listens on
+        """
+        loop = asyncio.get_running_loop()
+        if self.workers > 0:
+            # forked workers would hold the sockets of the connections open at the time
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=context, initializer=_start_worker, initargs=(self.templates,))
+            # starts every worker, so the first requests do not wait for templates to load
+            await asyncio.gather(*[loop.run_in_executor(self._pool, os.getpid) for _ in range(self.workers)])
+        else:
+            _warm(self.templates)
+            self._pool = ThreadPoolExecutor(1)
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._handle, path)
+        else:
+            self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()
+
+    async def close(self):
+        """
+        Stops listening and shuts the worker pool down once running renders are done
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._pool is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._pool.shutdown)
+            self._pool = None
+
+    async def render(self, spec: dict):
+        """
+        Renders a diagram spec in the worker pool, applying the concurrency limits of the server
+
+        Parameters
+        ----------
+        spec : dict
+            The diagram spec, see py2drawio.batch.build
+
+        Returns
+        -------
+        result : RenderResult
+            The outcome of the render, see py2drawio.batch.render. The error of a failed render is the message of the exception, without its traceback.
+
+        Raises
+        ------
+        Overloaded
+            If max_queue renders are already waiting for a worker
+        """
+        metrics = self.metrics
+        if self._slots.locked() and metrics.queued >= self.max_queue:
+            metrics.rejected += 1
+            raise Overloaded(f"{metrics.queued} renders are already queued")
+        start = perf_counter()
+        metrics.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            metrics.queued -= 1
+        metrics.in_flight += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._pool, partial(_render, spec))
+        except Exception as exception:
+            # the spec could not be sent to a worker, or the worker died
+            result = None
+            error = _message(exception)
+        finally:
+            metrics.in_flight -= 1
+            self._slots.release()
+        metrics.requests += 1
+        metrics.latencies.append(perf_counter() - start)
+        if result is None:
+            metrics.errors += 1
+            return RenderResult(0, spec.get('name'), None, None, error, 0.0)
+        metrics.render_seconds.append(result.seconds)
+        if result.error is not None:
+            metrics.errors += 1
+        return result
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Serves the HTTP/1.1 and HTTP/1.0 requests of a connection until either side closes it
+        """
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                options = {option.strip() for option in headers.get('connection', '').lower().split(',')}
+                # HTTP/1.0 connections are only kept open on request
+                keep_alive = 'keep-alive' in options if version == 'HTTP/1.0' else 'close' not in options
+                if isinstance(body, int):
+                    status, content_type, payload, extra = body, 'application/json', _error("Invalid request"), {}
+                    keep_alive = False
+                else:
+                    status, content_type, payload, extra = await self._respond(method, target, body)
+                _write_response(writer, status, content_type, payload, extra, keep_alive)
+                await writer.drain()
+                if isinstance(body, int):
+                    await _discard(reader, writer)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method: str, target: str, body: bytes):
+        """
+        Returns the status, content type, body and extra headers of the response to a request
+        """
+        path = target.split('?', 1)[0]
+        if path == '/health':
+            return 200, 'text/plain', b"ok\n", {}
+        if path == '/metrics':
+            if method != 'GET':
+                return 405, 'application/json', _error("Use GET"), {}
+            return 200, 'application/json', json.dumps(self.metrics.as_dict()).encode(), {}
+        if path != '/render':
+            return 404, 'application/json', _error(f"No such endpoint {path}"), {}
+        if method != 'POST':
+            return 405, 'application/json', _error("Use POST"), {}
+        try:
+            spec = json.loads(body)
+        except ValueError as error:
+            return 400, 'application/json', _error(f"Invalid JSON: {error}"), {}
+        if not isinstance(spec, dict):
+            return 400, 'application/json', _error("The spec must be a JSON object"), {}
+        if spec.get('output') is not None:
+            return 400, 'application/json', _error("Specs rendered by the server cannot have an output"), {}
+        template = spec.get('template')
+        if template is not None and not isinstance(template, dict) and template not in self.templates:
+            return 400, 'application/json', _error("The template must be inline or one of the templates the server was started with"), {}
+        try:
+            result = await self.render(spec)
+        except Overloaded as error:
+            return 503, 'application/json', _error(str(error)), {'Retry-After': '1'}
+        if result.error is not None:
+            return 422, 'application/json', _error(result.error), {}
+        content_type = 'application/gzip' if spec.get('gzip') else 'application/xml'
+        return 200, content_type, result.data, {'X-Render-Seconds': f"{result.seconds:.6f}"}
+
+
+def _render(spec: dict):
+    """
+    Builds and writes a diagram in a worker process. Failures are reported by their message, their traceback stays in the server.
+    """
+    start = perf_counter()
+    data = error = None
+    try:
+        target = BytesIO()
+        build(spec).write(target, compressed=spec.get('compressed', False), gzip=spec.get('gzip', False))
+        data = target.getvalue()
+    except Exception as exception:
+        error = _message(exception)
+    return RenderResult(0, spec.get('name'), None, data, error, perf_counter() - start)
+
+
+def _message(exception: Exception):
+    return "".join(traceback.format_exception_only(type(exception), exception)).strip()
+
+
+def _start_worker(templates: list):
+    # interrupts are handled by the server, which shuts the workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _warm(templates)
+
+
+def _error(message: str):
+    return json.dumps({'error': message}).encode()
+
+
+async def _read_request(reader: asyncio.StreamReader):
+    """
+    Reads an HTTP/1.1 or HTTP/1.0 request. Returns (method, target, version, headers, body), with the error status as body if the request cannot be served, or None once the client closed the connection.
+    """
+    headers = {}
+    try:
+        line = await reader.readline()
+        if not line:
+            return None
+        parts = line.decode('latin-1').split()
+        while True:
+            header = await reader.readline()
+            if header in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = header.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+    except (ValueError, asyncio.LimitOverrunError):
+        # a request or header line longer than the limit of the reader
+        return '', '', 'HTTP/1.1', headers, 400
+    if len(parts) != 3:
+        return '', '', 'HTTP/1.1', headers, 400
+    method, target, version = parts
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        return method, target, version, headers, 400
+    if length < 0:
+        return method, target, version, headers, 400
+    if length > MAX_BODY:
+        return method, target, version, headers, 413
+    body = await reader.readexactly(length) if length else b""
+    return method, target, version, headers, body
+
+
+async def _discard(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, timeout: float = 1.0):
+    """
+    Drops the rest of a rejected request for up to timeout seconds, so that closing the connection does not reset it before the client reads the response
+    """
+    if writer.can_write_eof():
+        writer.write_eof()
+
+    async def drain():
+        while await reader.read(65536):
+            pass
+    try:
+        await asyncio.wait_for(drain(), timeout)
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+
+
+def _write_response(writer: asyncio.StreamWriter, status: int, content_type: str, body: bytes, headers: dict, keep_alive: bool):
+    head = [
+        f"HTTP/1.1 {status} {REASONS[status]}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    head.extend(f"{name}: {value}" for name, value in headers.items())
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body)
+
+
+def serve(host: str = "127.0.0.1", port: int = 8080, path: str = None, **options):
+    """
+    Runs a render server until it is interrupted
+
+    Parameters
+    ----------
+    host : str, optional
+        The address to listen on. Default 127.0.0.1
+    port : int, optional
+        The TCP port to listen on. Default 8080
+    path : str, optional
+        The filename of a Unix socket to listen on instead of a TCP port
+    **options
+        RenderServer arguments: workers, templates, max_concurrent, max_queue and window
+
+    Returns
+    -------
+    None
+    """
+    server = RenderServer(**options)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        address = loop.run_until_complete(server.start(host, port, path))
+        print(f"Serving on {address}", flush=True)
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.run_until_complete(server.close())
+        loop.close()
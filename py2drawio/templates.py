@@ -0,0 +1,141 @@
+import json
+import os
+from glob import glob
+from hashlib import sha256
+from os.path import dirname, expanduser, join, realpath
+from types import MappingProxyType
+
+DEFAULT_TEMPLATE = join(dirname(realpath(__file__)), "nodetypes.yml")
+
+# Parsed templates shared by every Diagram of the process, keyed by real path
+_templates = {}
+
+
+def cache_dir(*parts: str):
+    """
+    Returns the directory used by py2drawio for on-disk caches
+
+    The location can be set with the PY2DRAWIO_CACHE_DIR environment variable. It defaults to py2drawio in the user cache directory.
+
+    Parameters
+    ----------
+    *parts : str
+        Subdirectories to be appended to the cache directory
+
+    Returns
+    -------
+    path : str
+        The cache directory. It is not created.
+    """
+    base = os.environ.get("PY2DRAWIO_CACHE_DIR")
+    if base is None:
+        base = join(os.environ.get("XDG_CACHE_HOME") or expanduser("~/.cache"), "py2drawio")
+    return join(base, *parts)
+
+
+def _cache_prefix(path: str):
+    return join(cache_dir("templates"), sha256(path.encode()).hexdigest()[:32])
+
+
+def load_template(path: str = None, disk_cache: bool = True):
+    """
+    Loads a node type template, parsing each template file at most once per process
+
+    The parsed template is shared between all callers and is read-only: the template and its node types are mappingproxy objects. Diagram takes its own copy, which can be modified. The template is reloaded when the file's modification time or size changes. Parsed templates are also kept in an on-disk cache keyed by path, modification time and size, so later runs do not need to parse yaml at all.
+
+    Parameters
+    ----------
+    path : str, optional
+        The filename of the template file in yaml format. If not specified, the default template will be used.
+    disk_cache : bool, optional
+        If false, the on-disk cache is neither read nor written. Default True
+
+    Returns
+    -------
+    nodetypes : mappingproxy
+        The node types defined in the template
+    """
+    path = realpath(path if path is not None else DEFAULT_TEMPLATE)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _templates.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    nodetypes = None
+    cache_file = f"{_cache_prefix(path)}-{stamp[0]}-{stamp[1]}.json"
+    if disk_cache:
+        try:
+            with open(cache_file) as f:
+                nodetypes = json.load(f)
+        except (OSError, ValueError):
+            pass
+    if nodetypes is None:
+        from yaml import safe_load
+        with open(path) as f:
+            nodetypes = safe_load(f)
+        if disk_cache:
+            _write_cache(path, cache_file, nodetypes)
+    nodetypes = _freeze(nodetypes)
+    _templates[path] = (stamp, nodetypes)
+    return nodetypes
+
+
+def _freeze(nodetypes):
+    if not isinstance(nodetypes, dict):
+        return nodetypes
+    return MappingProxyType({
+        name: MappingProxyType(dict(entry)) if isinstance(entry, dict) else entry
+        for name, entry in nodetypes.items()
+    })
+
+
+def _write_cache(path: str, cache_file: str, nodetypes: dict):
+    """
+    Replaces the on-disk cache entries of a template. Failures are ignored, the cache is only an optimisation. Templates that JSON cannot represent exactly, with dates or integer keys for instance, are not cached.
+    """
+    try:
+        data = json.dumps(nodetypes)
+        if json.loads(data) != nodetypes:
+            return
+    except (TypeError, ValueError):
+        return
+    temp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(dirname(cache_file), exist_ok=True)
+        for stale in glob(f"{_cache_prefix(path)}-*.json"):
+            os.remove(stale)
+        with open(temp_file, "w") as f:
+            f.write(data)
+        os.replace(temp_file, cache_file)
+    except OSError:
+        try:
+            os.remove(temp_file)
+        except OSError:
+            pass
+
+
+def invalidate_cache(path: str = None):
+    """
+    Drops cached templates from memory and from the on-disk cache
+
+    Parameters
+    ----------
+    path : str, optional
+        The filename of the template to be dropped. If not specified, every cached template will be dropped.
+
+    Returns
+    -------
+    None
+    """
+    if path is None:
+        _templates.clear()
+        pattern = join(cache_dir("templates"), "*.json")
+    else:
+        path = realpath(path)
+        _templates.pop(path, None)
+        pattern = f"{_cache_prefix(path)}-*.json"
+    for cache_file in glob(pattern):
+        try:
+            os.remove(cache_file)
+        except OSError:
+            pass
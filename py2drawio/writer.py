@@ -0,0 +1,269 @@
+import xml.etree.ElementTree as ET
+import zlib
+from itertools import islice
+from base64 import b64decode, b64encode
+from urllib.parse import quote, unquote
+
+# Characters left alone by javascript's encodeURIComponent, which draw.io applies before deflating
+_URI_SAFE = "!'()*"
+# "%" comes first so that the escapes introduced by later replacements are left alone
+_URI_ESCAPES = [("%", "%25")] + [
+    (char, f"%{ord(char):02X}") for char in map(chr, range(128))
+    if not (char.isalnum() or char in "%-_.~" + _URI_SAFE)
+]
+
+
+def _encode_uri_component(text: str):
+    """
+    Percent-encodes text like javascript's encodeURIComponent
+
+    ASCII text is encoded with one str.replace pass per escaped character that occurs in it, which is several times faster than urllib's per-byte quoting on large pages.
+    """
+    if not text.isascii():
+        return quote(text, safe=_URI_SAFE)
+    for char, escape in _URI_ESCAPES:
+        if char in text:
+            text = text.replace(char, escape)
+    return text
+
+
+def _decode_uri_component(text: str):
+    """
+    Decodes text encoded like javascript's encodeURIComponent
+
+    Text that only holds the escapes produced by _encode_uri_component for ASCII text is decoded with one str.replace pass per escape, which needs far less time and memory than urllib's unquote on large pages. Anything else goes through unquote.
+    """
+    decoded = text
+    for char, escape in reversed(_URI_ESCAPES[1:]):
+        if escape in decoded:
+            decoded = decoded.replace(escape, char)
+    # every "%" left must start a "%25" escape, otherwise the text holds escapes of other characters
+    if decoded.count("%") != decoded.count("%25"):
+        return unquote(text)
+    return decoded.replace("%25", "%")
+
+
+def compress_diagram(xml: str):
+    """
+    Compresses the XML of a page the way draw.io does: url-encoded, raw deflated and base64 encoded
+
+    Parameters
+    ----------
+    xml : str
+        The XML of the mxGraphModel element of the page
+
+    Returns
+    -------
+    payload : str
+        The text content of the compressed diagram element
+    """
+    deflate = zlib.compressobj(wbits=-15)
+    data = deflate.compress(_encode_uri_component(xml).encode("ascii")) + deflate.flush()
+    return b64encode(data).decode("ascii")
+
+
+def decompress_diagram(payload: str):
+    """
+    Decompresses the text content of a compressed draw.io diagram element
+
+    Parameters
+    ----------
+    payload : str
+        The text content of the compressed diagram element
+
+    Returns
+    -------
+    xml : str
+        The XML of the mxGraphModel element of the page
+    """
+    data = zlib.decompress(b64decode(payload), wbits=-15)
+    return _decode_uri_component(data.decode("ascii"))
+
+
+class _TextSink:
+    """
+    A buffered text sink that encodes everything written to it as ASCII XML, passing the result on to a binary file as it goes
+    """
+    chunk_size = 1 << 16
+
+    def __init__(self, out):
+        self.out = out
+        self.buffer = []
+        self.buffered = 0
+
+    def write(self, text: str):
+        self.buffer.append(text)
+        self.buffered += len(text)
+        if self.buffered >= self.chunk_size:
+            self._flush()
+
+    def _flush(self):
+        text = "".join(self.buffer)
+        self.buffer = []
+        self.buffered = 0
+        self._emit_text(text)
+
+    def _emit_text(self, text: str):
+        self.out.write(text.encode("ascii", "xmlcharrefreplace"))
+
+    def close(self):
+        self._flush()
+
+
+class _CompressedPayload(_TextSink):
+    """
+    A text sink that url-encodes, deflates and base64 encodes everything written to it, passing the result on to a binary file as it goes
+    """
+    def __init__(self, out):
+        super().__init__(out)
+        self.deflate = zlib.compressobj(wbits=-15)
+        self.pending = b""
+
+    def _emit_text(self, text: str):
+        self._emit(self.deflate.compress(_encode_uri_component(text).encode("ascii")))
+
+    def _emit(self, data: bytes):
+        data = self.pending + data
+        cut = len(data) - (len(data) % 3)
+        if cut:
+            self.out.write(b64encode(data[:cut]))
+        self.pending = data[cut:]
+
+    def close(self):
+        self._flush()
+        self._emit(self.deflate.flush())
+        self.out.write(b64encode(self.pending))
+        self.pending = b""
+
+
+def _tags(element: ET.Element, attrib: dict = None, text: bool = True):
+    """
+    Returns the serialized start tag, followed by the element's text if requested, and end tag of an element
+    """
+    shell = ET.Element(element.tag, element.attrib if attrib is None else attrib)
+    if text:
+        shell.text = element.text
+    xml = ET.tostring(shell, encoding="us-ascii", short_empty_elements=False)
+    cut = xml.rindex(b"</")
+    return xml[:cut], xml[cut:]
+
+
+def _write_cells(cells, sink: _TextSink, batch: int = 1024):
+    """
+    Serializes cells to a text sink a batch at a time, so that only one batch of them needs to exist at once
+    """
+    cells = iter(cells)
+    while True:
+        shell = ET.Element("batch")
+        shell.extend(islice(cells, batch))
+        if len(shell) == 0:
+            return
+        # strip the <batch> and </batch> tags of the shell
+        sink.write(ET.tostring(shell, encoding="unicode")[7:-8])
+
+
+def _write_model(model: ET.Element, sink: _TextSink, extra, tail: bool):
+    """
+    Serializes an mxGraphModel element to a text sink, streaming the extra cells after the existing cells of its root
+    """
+    if extra is None:
+        saved = model.tail
+        if not tail:
+            model.tail = None
+        try:
+            ET.ElementTree(model).write(sink, encoding="unicode")
+        finally:
+            model.tail = saved
+        return
+    root = model.find("root")
+    start, end = _tags(model)
+    sink.write(start.decode("ascii"))
+    for child in model:
+        if child is not root:
+            ET.ElementTree(child).write(sink, encoding="unicode")
+            continue
+        root_start, root_end = _tags(root)
+        sink.write(root_start.decode("ascii"))
+        for cell in root:
+            ET.ElementTree(cell).write(sink, encoding="unicode")
+        _write_cells(extra, sink)
+        sink.write(root_end.decode("ascii"))
+        if root.tail:
+            sink.write(root.tail)
+    sink.write(end.decode("ascii"))
+    if tail and model.tail:
+        sink.write(model.tail)
+
+
+def write_page(page: ET.Element, out, compressed: bool = False, extra = None):
+    """
+    Streams a single diagram element to a binary file
+
+    Parameters
+    ----------
+    page : ET.Element
+        The diagram element to be written
+    out : file-like
+        The binary file-like object to be written to
+    compressed : bool, optional
+        If true, the content of the page is written as a compressed draw.io payload. Default False
+    extra : iterable of ET.Element, optional
+        Cells to be serialized one at a time after the existing cells of the page, without being added to it
+
+    Returns
+    -------
+    None
+    """
+    if len(page) == 0 or (extra is None and not compressed):
+        ET.ElementTree(page).write(out, encoding="us-ascii")
+        return
+    start, end = _tags(page, text=not compressed)
+    out.write(start)
+    sink = _CompressedPayload(out) if compressed else _TextSink(out)
+    for model in page:
+        _write_model(model, sink, extra, not compressed)
+    sink.close()
+    out.write(end)
+    if page.tail:
+        out.write(page.tail.encode("ascii", "xmlcharrefreplace"))
+
+
+def write_mxfile(root: ET.Element, out, compressed = False, extra: dict = None, serialized: dict = None):
+    """
+    Streams a draw.io file to a binary file, one page at a time
+
+    Parameters
+    ----------
+    root : ET.Element
+        The mxfile element to be written
+    out : file-like
+        The binary file-like object to be written to
+    compressed : bool or collection of ET.Element, optional
+        If true, every page is written as a compressed draw.io payload. If a collection of diagram elements, only those pages are compressed. Default False
+    extra : dict, optional
+        Maps diagram elements to cells to be streamed after their existing cells, see write_page
+    serialized : dict, optional
+        Maps diagram elements to their already serialized bytes, which are written as they are
+
+    Returns
+    -------
+    None
+    """
+    if extra is None:
+        extra = {}
+    if serialized is None:
+        serialized = {}
+    attrib = dict(root.attrib)
+    if compressed is True:
+        attrib["compressed"] = "true"
+    else:
+        attrib.pop("compressed", None)
+    start, end = _tags(root, attrib)
+    out.write(start)
+    for page in root:
+        if page in serialized:
+            out.write(serialized[page])
+            continue
+        page_compressed = compressed if isinstance(compressed, bool) else page in compressed
+        write_page(page, out, page_compressed, extra.get(page))
+    out.write(end)
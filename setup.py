@@ -1,7 +1,13 @@
+import re
+import setuptools
 from setuptools import setup
 
+# the version is defined once, in the package
+with open('py2drawio/__init__.py') as f:
+    version = re.search(r"^__version__ = '([^']+)'", f.read(), re.M).group(1)
+
 setup(name='py2drawio',
-    version='0.1',
+    version=version,
     description='Define a draw.io diagram using python',
     url='https://github.com/Bunnikins/py2drawio',
     author='Bunnikins',
@@ -16,5 +22,11 @@ setup(name='py2drawio',
     install_requires=[
         'pyyaml',
     ],
-    python_requires='>=3.6',
+    extras_require={
+        'numpy': ['numpy'],
+    },
+    entry_points={
+        'console_scripts': ['py2drawio=py2drawio.cli:main'],
+    },
+    python_requires='>=3.7',
 )
\ No newline at end of file
@@ -0,0 +1,21 @@
+import pytest
+
+from py2drawio import CompactDiagram, Diagram
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    """
+    Keeps the on-disk caches written by a test in its temporary directory
+    """
+    cache = tmp_path / "cache"
+    monkeypatch.setenv("PY2DRAWIO_CACHE_DIR", str(cache))
+    return cache
+
+
+@pytest.fixture(params=[Diagram, CompactDiagram])
+def backend(request):
+    """
+    Runs a test with each diagram class
+    """
+    return request.param
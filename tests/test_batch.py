@@ -0,0 +1,135 @@
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from io import BytesIO
+
+import pytest
+
+from py2drawio import BatchError
+
+NodeRecord = namedtuple('NodeRecord', ['node_id', 'node_type', 'node_name', 'node_height', 'node_width', 'layer', 'parent'])
+
+
+def cells(diagram):
+    """
+    Returns the IDs of the written cells of the current page, in order
+    """
+    out = BytesIO()
+    diagram.write(out)
+    root = ET.fromstring(out.getvalue()).find('diagram/mxGraphModel/root')
+    return [cell.get('id') for cell in root]
+
+
+def test_forward_parent_references(backend):
+    diagram = backend()
+    nodes = diagram.add_nodes([
+        ('i0', 'EC2Instance', 'I0', None, None, 1, 'subnet'),
+        ('subnet', 'PrivateSubnet', 'Subnet', None, None, 0, 'vpc'),
+        ('vpc', 'VPC', 'VPC'),
+    ])
+    # nodes are returned in the order they were given
+    assert [node.get('id') for node in nodes] == ['i0', 'subnet', 'vpc']
+    assert diagram._parent_id(diagram.get('i0')) == 'subnet'
+    assert diagram._parent_id(diagram.get('subnet')) == 'vpc'
+    assert diagram._parent_id(diagram.get('vpc')) == '1'
+    assert diagram.get('i0').get('layer') == '1'
+
+
+def test_parents_are_written_before_children(backend):
+    diagram = backend()
+    diagram.add_nodes([
+        ('i0', 'EC2Instance', 'I0', None, None, 0, 'subnet'),
+        ('i1', 'EC2Instance', 'I1', None, None, 0, 'subnet'),
+        ('subnet', 'PrivateSubnet', 'Subnet', None, None, 0, 'vpc'),
+        ('vpc', 'VPC', 'VPC'),
+    ])
+    order = cells(diagram)
+    assert order.index('vpc') < order.index('subnet') < order.index('i0') < order.index('i1')
+
+
+def test_existing_parents_by_node_and_id(backend):
+    diagram = backend()
+    vpc = diagram.add_node('vpc', 'VPC', 'VPC')
+    diagram.add_nodes([('a', 'EC2Instance', 'A', None, None, 0, vpc), {'node_id': 'b', 'node_type': 'EC2Instance', 'node_name': 'B', 'parent': 'vpc'}])
+    assert diagram._parent_id(diagram.get('a')) == diagram._parent_id(diagram.get('b')) == 'vpc'
+
+
+def test_csv_empty_strings_are_unspecified(backend):
+    diagram = backend()
+    default = diagram.add_node('default', 'EC2Instance', 'Default')
+    # as read by csv.DictReader from a file with empty columns
+    [node] = diagram.add_nodes([{'node_id': 'csv', 'node_type': 'EC2Instance', 'node_name': 'CSV', 'node_height': '', 'node_width': '', 'layer': '', 'parent': ''}])
+    assert diagram._size(diagram._geometry(node)) == diagram._size(diagram._geometry(default))
+    assert node.get('layer') == '0'
+    assert diagram._parent_id(node) == '1'
+    [edge] = diagram.add_edges([{'source': 'default', 'target': 'csv', 'name': ''}])
+    assert edge.get('label') == ''
+
+
+def test_record_kinds(backend):
+    diagram = backend()
+    nodes = diagram.add_nodes([
+        ('vpc', 'VPC', 'VPC'),
+        {'node_id': 'a', 'node_type': 'EC2Instance', 'node_name': 'A', 'parent': 'vpc'},
+        NodeRecord('b', 'EC2Instance', 'B', 60, 70, 2, 'vpc'),
+    ])
+    assert [node.get('label') for node in nodes] == ['VPC', 'A', 'B']
+    assert diagram._size(diagram._geometry(nodes[2])) == (70, 60)
+    assert nodes[2].get('layer') == '2'
+    Link = namedtuple('Link', ['source', 'target', 'name'])
+    edges = diagram.add_edges([('a', 'b'), {'source': nodes[2], 'target': 'vpc', 'name': 'up'}, Link('vpc', 'a', 'down')])
+    assert [edge.get('id') for edge in edges] == ['a-b', 'b-vpc', 'vpc-a']
+    assert [edge.get('label') for edge in edges] == ['', 'up', 'down']
+    assert [edge.get('id') for edge in diagram.edges_of(nodes[1])] == ['a-b', 'vpc-a']
+
+
+def test_every_node_error_is_reported_and_nothing_is_added(backend):
+    diagram = backend()
+    diagram.add_node('vpc', 'VPC', 'VPC')
+    before = cells(diagram)
+    with pytest.raises(BatchError) as raised:
+        diagram.add_nodes([
+            ('ok', 'EC2Instance', 'OK', None, None, 0, 'vpc'),
+            ('vpc', 'VPC', 'Duplicate'),
+            ('bad', 'Unknown', 'Bad'),
+            ('orphan', 'EC2Instance', 'Orphan', None, None, 0, 'missing'),
+            ('1', 'EC2Instance', 'Root'),
+            {'node_id': 'typo', 'node_type': 'EC2Instance', 'node_name': 'Typo', 'colour': 'red'},
+            ('short', 'EC2Instance'),
+            ('a', 'EC2Instance', 'A', None, None, 0, 'b'),
+            ('b', 'EC2Instance', 'B', None, None, 0, 'a'),
+        ])
+    errors = raised.value.errors
+    assert errors == [
+        "Row 1: Node with ID vpc already exists",
+        "Row 2: Node type Unknown not found",
+        "Row 3: Parent missing not found",
+        "Row 4: Node ID cannot be 0 or 1",
+        "Row 5: Unknown fields colour",
+        "Row 6: node_id, node_type and node_name are required",
+        "Row 7: Parent cycle through node a",
+    ]
+    assert cells(diagram) == before
+    assert diagram.get('ok') is None
+
+
+def test_every_edge_error_is_reported_and_nothing_is_added(backend):
+    diagram = backend()
+    a, b = diagram.add_nodes([('a', 'EC2Instance', 'A'), ('b', 'EC2Instance', 'B')])
+    diagram.add_edge(a, b)
+    before = cells(diagram)
+    with pytest.raises(BatchError) as raised:
+        diagram.add_edges([
+            ('b', 'a'),
+            ('a', 'b'),
+            ('a', 'missing'),
+            ('a', 'b', 'name', 'extra'),
+            ('b', 'a'),
+        ])
+    assert raised.value.errors == [
+        "Row 1: Edge between a and b already exists",
+        "Row 2: Target missing not found",
+        "Row 3: Too many values, expected at most 3",
+        "Row 4: Edge between b and a already exists",
+    ]
+    assert cells(diagram) == before
+    assert diagram.get('b-a') is None
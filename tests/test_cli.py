@@ -0,0 +1,35 @@
+import pytest
+
+from py2drawio.cli import main
+from py2drawio.templates import invalidate_cache
+
+
+@pytest.fixture
+def spec(tmp_path):
+    path = tmp_path / "spec.yml"
+    path.write_text("nodes:\n  - [vpc, VPC, VPC]\n  - [web, EC2Instance, Web, null, null, 0, vpc]\n")
+    return path
+
+
+@pytest.mark.parametrize("before", [True, False])
+def test_cache_dir_before_or_after_the_command(tmp_path, spec, monkeypatch, before):
+    monkeypatch.delenv("PY2DRAWIO_CACHE_DIR", raising=False)
+    invalidate_cache()
+    cache = tmp_path / "cli-cache"
+    options = ["--cache-dir", str(cache)]
+    main(options + ["build", str(spec)] if before else ["build", str(spec)] + options)
+    assert (tmp_path / "spec.drawio").exists()
+    assert any((cache / "builds").rglob("*.drawio"))
+    assert any((cache / "templates").glob("*.json"))
+    main(["clear-cache"] + options)
+    assert not any((cache / "builds").rglob("*.drawio"))
+    assert not any((cache / "templates").glob("*.json"))
+
+
+def test_second_build_is_cached(tmp_path, spec, monkeypatch, capsys):
+    monkeypatch.setenv("PY2DRAWIO_CACHE_DIR", str(tmp_path / "cache"))
+    main(["build", str(spec)])
+    main(["build", str(spec), "-o", str(tmp_path / "copy.drawio")])
+    lines = capsys.readouterr().out.splitlines()
+    assert "(built," in lines[0] and "(cached," in lines[1]
+    assert (tmp_path / "copy.drawio").read_bytes() == (tmp_path / "spec.drawio").read_bytes()
@@ -0,0 +1,86 @@
+import os
+import runpy
+from io import BytesIO
+
+from py2drawio import Diagram
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "example.py")
+AZS = ['eu-west-1a', 'eu-west-1b', 'eu-west-1c']
+
+
+def network(backend=Diagram, cache=True):
+    diagram = backend()
+    vpc = diagram.add_node('vpc1', 'VPC', 'VPC')
+    public = diagram.add_node('public_subnet_container', 'BlankContainer', 'Public Subnets', parent=vpc)
+    private = diagram.add_node('private_subnet_container', 'BlankContainer', 'Private Subnets', parent=vpc)
+    public_subnets = {az: diagram.add_node(f'public_subnet_{az}', 'PublicSubnet', f'Public Subnet {az}', parent=public) for az in AZS}
+    private_subnets = {az: diagram.add_node(f'private_subnet_{az}', 'PrivateSubnet', f'Private Subnet {az}', parent=private) for az in AZS}
+    proxy = diagram.add_node('reverse_proxy', 'EC2Instance', 'Reverse Proxy', parent=public_subnets['eu-west-1b'])
+    web_servers = [diagram.add_node(f'web_server_{az}', 'EC2Instance', f'Web Server {az}', parent=private_subnets[az]) for az in AZS]
+    diagram.add_node('rds_instance', 'RDSInstance', 'rds_instance', parent=private_subnets['eu-west-1b'])
+    if cache:
+        diagram.add_node('cache', 'EC2Instance', 'Cache', parent=private_subnets['eu-west-1b'])
+    for web_server in web_servers:
+        diagram.add_edge(web_server, proxy)
+    return diagram, vpc, public, private, public_subnets, private_subnets
+
+
+def written(diagram):
+    out = BytesIO()
+    diagram.write(out)
+    return out.getvalue()
+
+
+def compose_by_hand(diagram, vpc, public, private, public_subnets, private_subnets):
+    # innermost containers first, as before compose_all
+    for subnet in public_subnets.values():
+        diagram.compose_children(subnet, orientation='portrait')
+    for az, subnet in private_subnets.items():
+        if az == 'eu-west-1b':
+            diagram.compose_children(subnet, hpack=True, sorted=True)
+        else:
+            diagram.compose_children(subnet, orientation='portrait', sorted=True)
+    diagram.compose_children(public, width=len(AZS), text_padding=20)
+    diagram.compose_children(private, width=len(AZS), text_padding=20)
+    diagram.compose_children(vpc, vpack=True, text_padding=10, cell_padding=0)
+
+
+LAYOUT = {
+    'PublicSubnet': {'orientation': 'portrait'},
+    'PrivateSubnet': {'orientation': 'portrait', 'sorted': True},
+    'private_subnet_eu-west-1b': {'orientation': 'landscape', 'hpack': True},
+    'BlankContainer': {'width': len(AZS), 'text_padding': 20},
+    'VPC': {'vpack': True, 'text_padding': 10, 'cell_padding': 0},
+}
+
+
+def test_compose_all_matches_hand_ordered_compose_children(backend):
+    expected, *containers = network(backend)
+    compose_by_hand(expected, *containers)
+    diagram, *_ = network(backend)
+    diagram.compose_all(LAYOUT)
+    assert written(diagram) == written(expected)
+
+
+def test_compose_all_below_a_container(backend):
+    expected, vpc, public, private, public_subnets, private_subnets = network(backend)
+    for subnet in public_subnets.values():
+        expected.compose_children(subnet, cell_padding=10)
+    expected.compose_children(public, cell_padding=10)
+    diagram, _, public, _, _, _ = network(backend)
+    diagram.compose_all(parent=public, cell_padding=10)
+    assert written(diagram) == written(expected)
+
+
+def test_example_output(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    runpy.run_path(EXAMPLE)
+    diagram, vpc, public, private, public_subnets, private_subnets = network(cache=False)
+    # the compose_children calls of the example before compose_all
+    for subnets in (public_subnets, private_subnets):
+        for subnet in subnets.values():
+            diagram.compose_children(subnet, orientation='portrait')
+    diagram.compose_children(public, width=len(AZS), text_padding=20)
+    diagram.compose_children(private, width=len(AZS), text_padding=20)
+    diagram.compose_children(vpc, vpack=True, text_padding=10, cell_padding=0)
+    assert (tmp_path / "testout.drawio").read_bytes() == written(diagram)
@@ -0,0 +1,54 @@
+import xml.etree.ElementTree as ET
+from io import BytesIO
+
+import pytest
+
+from py2drawio import Diagram
+
+
+@pytest.fixture
+def diagram(backend):
+    diagram = backend()
+    diagram.sync(
+        [('v1', 'VPC', 'V1'), ('v2', 'VPC', 'V2')]
+        + [(node_id, 'EC2Instance', node_id, None, None, 0, parent) for node_id, parent in (('a', 'v1'), ('b', 'v1'), ('c', 'v2'), ('d', 'v2'))],
+        [('a', 'c', 'http'), ('b', 'd', 'http'), ('a', 'b')],
+    )
+    return diagram
+
+
+def test_edges_of(diagram):
+    assert {edge.get('id') for edge in diagram.edges_of('a')} == {'a-c', 'a-b'}
+    assert [edge.get('id') for edge in diagram.edges_of('a', 'in')] == []
+    assert [edge.get('id') for edge in diagram.edges_of('b', 'in')] == ['a-b']
+
+
+def test_aggregate_between_containers(diagram):
+    created = diagram.aggregate_edges(['VPC'], label="{count} ({names})")
+    assert [edge.get('id') for edge in created] == ['v1-v2']
+    assert diagram.get('v1-v2').get('label') == "2 (http)"
+    assert diagram.get('a-c') is None and diagram.get('b-d') is None
+    # edges inside a container are kept
+    assert diagram.get('a-b') is not None
+
+
+def test_aggregating_again_counts_the_original_edges(diagram):
+    diagram.aggregate_edges(['VPC'], label="{count} ({names})")
+    diagram.add_edges([('a', 'd', 'https')])
+    diagram.aggregate_edges(['VPC'], label="{count} ({names})")
+    edge = diagram.get('v1-v2')
+    count, names = edge.get('label').split(" ", 1)
+    assert count == "3" and set(names.strip("()").split(", ")) == {"http", "https"}
+    assert edge.get('aggregated') == '3'
+
+
+def test_aggregated_counts_are_written(diagram):
+    diagram.aggregate_edges(['VPC'])
+    out = BytesIO()
+    diagram.write(out)
+    edges = [element for element in ET.fromstring(out.getvalue()).iter('object') if element.get('id') == 'v1-v2']
+    assert [edge.get('aggregated') for edge in edges] == ['2']
+    reloaded = Diagram(BytesIO(out.getvalue()))
+    reloaded.add_edges([('a', 'd')])
+    reloaded.aggregate_edges(['VPC'])
+    assert reloaded.get('v1-v2').get('label') == '3'
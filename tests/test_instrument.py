@@ -0,0 +1,34 @@
+import pytest
+
+from py2drawio import Diagram
+
+
+def error_of(call):
+    with pytest.raises(Exception) as info:
+        call()
+    return type(info.value), str(info.value)
+
+
+def test_timed_call_raises_its_own_error():
+    plain = Diagram()
+    instrumented = Diagram(stats=True)
+    assert error_of(lambda: instrumented.compose_children(None)) == error_of(lambda: plain.compose_children(None))
+    assert instrumented.stats.timings['compose_children']['calls'] == 1
+    assert instrumented.stats.containers == []
+
+
+def test_compose_children_details():
+    diagram = Diagram(stats=True)
+    vpc = diagram.add_node("vpc", "VPC", "VPC")
+    for i in range(3):
+        diagram.add_node(f"i{i}", "EC2Instance", f"I{i}", parent=vpc)
+    diagram.compose_children(vpc)
+    assert [container[:2] for container in diagram.stats.containers] == [("vpc", 3)]
+
+
+def test_cell_lookups_are_counted():
+    diagram = Diagram(stats=True)
+    diagram.sync([("vpc", "VPC", "VPC")] + [(f"i{i}", "EC2Instance", f"I{i}", None, None, 0, "vpc") for i in range(10)])
+    before = diagram.stats.counters['lookups']
+    diagram.sync([("i0", "EC2Instance", "renamed", None, None, 0, "vpc")])
+    assert diagram.stats.counters['lookups'] > before
@@ -0,0 +1,18 @@
+import pytest
+
+from py2drawio.layout import grid_layout
+
+
+@pytest.mark.parametrize("sizes", [[10.5, 20], [20, 10.5], [10, 20, 30], list(range(1, 1500))])
+@pytest.mark.parametrize("options", [{'hpack': True}, {'vpack': True}, {}, {'width': 3}])
+def test_numpy_matches_python(sizes, options):
+    pytest.importorskip("numpy")
+    vectorized = grid_layout(sizes, sizes, 0, 0, vectorize=True, **options)
+    plain = grid_layout(sizes, sizes, 0, 0, vectorize=False, **options)
+    assert vectorized == plain
+    assert [type(x) for x in vectorized[2]] == [type(x) for x in plain[2]]
+
+
+def test_packed_float_sizes():
+    _, _, xs, _ = grid_layout([10.5, 20], [1, 1], 0, 0, hpack=True)
+    assert xs == [20, 50.5]
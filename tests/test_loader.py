@@ -0,0 +1,77 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from py2drawio import Diagram
+from py2drawio.loader import iter_cells, load
+
+
+PAGES = ("Page-1", "second", "third")
+
+
+def build(path, compressed):
+    diagram = Diagram()
+    for name in PAGES:
+        if name != PAGES[0]:
+            diagram.add_page(name)
+        vpc = diagram.add_node(f"{name}_vpc", "VPC", "VPC")
+        a = diagram.add_node(f"{name}_a", "EC2Instance", "A", parent=vpc)
+        b = diagram.add_node(f"{name}_b", "EC2Instance", "B", parent=vpc)
+        diagram.add_edge(a, b)
+        diagram.compose_all()
+    diagram.write(str(path), compressed=compressed)
+    return path
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+def test_load_every_page(tmp_path, compressed):
+    _, loaded = load(str(build(tmp_path / "diagram.drawio", compressed)))
+    assert tuple(page.page.get('name') for page in loaded) == PAGES
+    for page in loaded:
+        name = page.page.get('name')
+        assert {f"{name}_vpc", f"{name}_a", f"{name}_b"} <= set(page.index)
+        assert [child.get('id') for child in page.children[f"{name}_vpc"]] == [f"{name}_a", f"{name}_b"]
+        assert len(page.outgoing[f"{name}_a"]) == 1
+        assert page.incoming[f"{name}_b"] == page.outgoing[f"{name}_a"]
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+def test_load_selected_pages(tmp_path, compressed):
+    path = build(tmp_path / "diagram.drawio", compressed)
+    root, loaded = load(str(path), pages=["third", 1])
+    assert [page.page.get('name') for page in loaded] == ["second", "third"]
+    first = root.find("./diagram[@name='Page-1']")
+    if compressed:
+        # pages that are not selected are not decoded
+        assert len(first) == 0 and first.text.strip()
+    else:
+        assert first.find("./mxGraphModel/root") is not None
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+def test_unselected_pages_are_written_back_unchanged(tmp_path, compressed):
+    path = build(tmp_path / "diagram.drawio", compressed)
+    original = {page.get('name'): ET.tostring(page) for page in ET.parse(str(path)).getroot()}
+    diagram = Diagram(str(path), pages=["second"])
+    assert list(diagram.pages) == ["second"]
+    diagram.add_node("second_c", "EC2Instance", "C", parent=diagram.get("second_vpc"))
+    output = tmp_path / "edited.drawio"
+    diagram.write(str(output), compressed=compressed)
+    edited = {page.get('name'): ET.tostring(page) for page in ET.parse(str(output)).getroot()}
+    assert edited["Page-1"] == original["Page-1"]
+    assert edited["third"] == original["third"]
+    assert edited["second"] != original["second"]
+    _, loaded = load(str(output), pages=["second"])
+    assert "second_c" in loaded[0].index
+
+
+def test_no_page_selected(tmp_path):
+    with pytest.raises(ValueError):
+        Diagram(str(build(tmp_path / "diagram.drawio", True)), pages=["missing"])
+
+
+def test_iter_cells_decodes_compressed_pages(tmp_path):
+    plain = [cell.attrib for cell in iter_cells(str(build(tmp_path / "plain.drawio", False)))]
+    compressed = [cell.attrib for cell in iter_cells(str(build(tmp_path / "compressed.drawio", True)))]
+    assert plain == compressed
+    assert {'source': "third_a", 'target': "third_b"}.items() <= compressed[-1].items()
@@ -0,0 +1,111 @@
+import xml.etree.ElementTree as ET
+from hashlib import sha256
+from io import BytesIO
+
+import pytest
+
+from py2drawio import Diagram
+from py2drawio.writer import decompress_diagram
+
+PAGES = ("Page-1", "two", "three")
+
+
+def build(backend=Diagram):
+    diagram = backend()
+    for name in PAGES:
+        if name != PAGES[0]:
+            diagram.add_page(name)
+        vpc = diagram.add_node("vpc", "VPC", f"VPC {name}")
+        subnet = diagram.add_node("subnet", "PrivateSubnet", "Subnet", parent=vpc)
+        for i in range(5):
+            diagram.add_node(f"i{i}", "EC2Instance", f"I{i}", parent=subnet)
+    diagram.select_page(PAGES[0])
+    return diagram
+
+
+def written(diagram, **options):
+    out = BytesIO()
+    diagram.write(out, **options)
+    return out.getvalue()
+
+
+def test_add_page_rejects_pages_that_were_not_loaded(tmp_path):
+    path = str(tmp_path / "diagram.drawio")
+    build().write(path)
+    diagram = Diagram(path, pages=["Page-1"])
+    with pytest.raises(ValueError, match="Page two already exists"):
+        diagram.add_page("two")
+    diagram.add_page("four")
+    ids = [page.get("id") for page in diagram.root.findall("diagram")]
+    assert len(set(ids)) == len(ids) == 4
+
+
+def test_add_page_ids_are_unique(tmp_path):
+    path = str(tmp_path / "diagram.drawio")
+    diagram = build()
+    # a page named differently that already has the ID a page named "four" would get
+    diagram.pages["two"].element.set("id", sha256(b"four").hexdigest()[:20])
+    diagram.write(path)
+    diagram = Diagram(path, pages=["Page-1"])
+    page = diagram.add_page("four")
+    ids = [element.get("id") for element in diagram.root.findall("diagram")]
+    assert page.element.get("id") != sha256(b"four").hexdigest()[:20]
+    assert len(set(ids)) == len(ids)
+
+
+def test_serialization_is_reused_until_the_page_changes(backend):
+    diagram = build(backend)
+    serialized = diagram.serialize_page("two")
+    assert diagram.serialize_page("two") is serialized
+    diagram.select_page("two")
+    diagram.add_node("new", "EC2Instance", "New")
+    assert diagram.serialize_page("two") is not serialized
+    assert b'id="new"' in diagram.serialize_page("two")
+    # edits made to the elements directly need Page.changed
+    serialized = diagram.serialize_page("two")
+    diagram._set(diagram.get("vpc"), "label", "edited")
+    assert diagram.serialize_page("two") is serialized
+    diagram.page.changed()
+    assert b'label="edited"' in diagram.serialize_page("two")
+
+
+def test_cached_write_matches_uncached_write(backend):
+    diagram = build(backend)
+    assert written(diagram, cache=True) == written(diagram)
+    cached = {name: page._serialized for name, page in diagram.pages.items()}
+    assert all(cached.values())
+    diagram.select_page("three")
+    diagram.compose_all()
+    assert diagram.pages["three"]._serialized is None
+    assert diagram.pages["two"]._serialized is cached["two"]
+    expected = build(backend)
+    expected.select_page("three")
+    expected.compose_all()
+    assert written(diagram, cache=True) == written(expected)
+
+
+def test_compressed_page_names(backend):
+    diagram = build(backend)
+    data = written(diagram, compressed=["two"])
+    root = ET.fromstring(data)
+    assert root.get("compressed") is None
+    pages = {page.get("name"): page for page in root.findall("diagram")}
+    assert len(pages["two"]) == 0
+    assert len(pages["Page-1"]) == len(pages["three"]) == 1
+    plain = {page.get("name"): page for page in ET.fromstring(written(diagram)).findall("diagram")}
+    plain["two"][0].tail = None
+    assert decompress_diagram(pages["two"].text) == ET.tostring(plain["two"][0], encoding="unicode")
+
+
+@pytest.mark.parametrize("pages", [None, ["two", "three"]])
+def test_parallel_compose_pages_matches_serial(backend, pages):
+    layout = {"PrivateSubnet": {"width": 2}, "VPC": {"text_padding": 10}}
+    serial = build(backend)
+    serial.compose_pages(layout, pages=pages, cell_padding=10)
+    parallel = build(backend)
+    parallel.compose_pages(layout, pages=pages, workers=2, cell_padding=10)
+    assert written(parallel) == written(serial)
+    assert parallel.page is parallel.pages["Page-1"]
+    if pages is not None:
+        assert written(parallel) != written(build(backend))
+        assert parallel.serialize_page("Page-1") == build(backend).serialize_page("Page-1")
@@ -0,0 +1,74 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from py2drawio import batch, render_many
+
+
+def spec(index, instances=2, **fields):
+    nodes = [('vpc', 'VPC', f'VPC {index}')] + [(f'i{i}', 'EC2Instance', f'I{i}', None, None, 0, 'vpc') for i in range(instances)]
+    return {'name': f'diagram-{index}', 'nodes': nodes, 'edges': [(f'i{i}', f'i{i + 1}') for i in range(instances - 1)], **fields}
+
+
+def label(result):
+    return ET.fromstring(result.data).find(".//object[@id='vpc']").get('label')
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_ordered_results_follow_the_specs(workers):
+    # the first specs are the slowest, so they finish last
+    specs = [spec(index, instances=400 if index < 2 else 2) for index in range(6)]
+    results = list(render_many(specs, workers=workers, ordered=True))
+    assert [result.index for result in results] == list(range(6))
+    assert [result.name for result in results] == [f'diagram-{index}' for index in range(6)]
+    assert [label(result) for result in results] == [f'VPC {index}' for index in range(6)]
+    assert all(result.error is None and result.output is None for result in results)
+
+
+def test_unordered_results_cover_every_spec():
+    results = list(render_many((spec(index) for index in range(5)), workers=2))
+    assert sorted(result.index for result in results) == list(range(5))
+    for result in results:
+        assert label(result) == f'VPC {result.index}'
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_failures_are_captured_per_spec(workers, tmp_path):
+    output = str(tmp_path / "written.drawio")
+    specs = [
+        spec(0),
+        {'name': 'bad type', 'nodes': [('x', 'Unknown', 'X')]},
+        ['not', 'a', 'dict'],
+        {'name': 'unknown field', 'colour': 'red'},
+        spec(4, output=output),
+    ]
+    results = {result.index: result for result in render_many(specs, workers=workers)}
+    assert sorted(results) == list(range(5))
+    assert results[0].error is None and label(results[0]) == 'VPC 0'
+    assert results[1].name == 'bad type' and 'Node type Unknown not found' in results[1].error
+    assert results[2].name is None and 'AttributeError' in results[2].error
+    assert results[3].name == 'unknown field' and 'Unknown spec fields colour' in results[3].error
+    for index in (1, 2, 3):
+        assert results[index].data is None and results[index].output is None
+    assert results[4].error is None and results[4].data is None and results[4].output == output
+    assert ET.parse(output).find(".//object[@id='vpc']").get('label') == 'VPC 4'
+
+
+def test_one_worker_renders_in_process(monkeypatch):
+    built = []
+    build = batch.build
+
+    def recording(spec, layouts=None):
+        built.append(spec['name'])
+        return build(spec, layouts)
+
+    # only renders in the calling process see the patched module
+    monkeypatch.setattr(batch, 'build', recording)
+    specs = (spec(index) for index in range(3))
+    results = render_many(specs, workers=1)
+    assert built == []
+    assert next(results).index == 0
+    # specs are consumed one at a time
+    assert built == ['diagram-0']
+    assert [result.index for result in results] == [1, 2]
+    assert built == ['diagram-0', 'diagram-1', 'diagram-2']
@@ -0,0 +1,164 @@
+import asyncio
+import json
+
+import pytest
+
+from py2drawio.server import RenderServer
+
+SPEC = {
+    'nodes': [('vpc', 'VPC', 'VPC')] + [(f'i{i}', 'EC2Instance', f'I{i}', None, None, 0, 'vpc') for i in range(4)],
+    'edges': [('i0', 'i1')],
+}
+
+
+async def request(address, raw: bytes):
+    reader, writer = await asyncio.open_connection(*address[:2])
+    writer.write(raw)
+    await writer.drain()
+    # the server must close the connection itself
+    response = await asyncio.wait_for(reader.read(), 5)
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    lines = head.decode('latin-1').split("\r\n")
+    headers = dict(line.lower().split(": ", 1) for line in lines[1:])
+    return int(lines[0].split()[1]), headers, body
+
+
+def post(address, spec, target="/render"):
+    body = spec if isinstance(spec, bytes) else json.dumps(spec).encode()
+    return request(address, f"POST {target} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+
+
+def serve(test, **options):
+    async def run():
+        server = RenderServer(workers=0, **options)
+        address = await server.start(port=0)
+        try:
+            return await test(server, address)
+        finally:
+            await server.close()
+    return asyncio.run(run())
+
+
+def test_render():
+    async def test(server, address):
+        status, headers, body = await post(address, SPEC)
+        assert status == 200
+        assert headers['content-type'] == 'application/xml'
+        assert b'id="i3"' in body
+        assert float(headers['x-render-seconds']) > 0
+    serve(test)
+
+
+@pytest.mark.parametrize("body", [
+    b"{not json",
+    b"[1, 2]",
+    json.dumps({**SPEC, 'output': '/tmp/out.drawio'}).encode(),
+    json.dumps({**SPEC, 'template': '/etc/passwd'}).encode(),
+])
+def test_invalid_specs(body):
+    async def test(server, address):
+        status, _, payload = await post(address, body)
+        assert status == 400
+        assert 'error' in json.loads(payload)
+        assert server.metrics.requests == 0
+    serve(test)
+
+
+def test_failed_render_reports_the_message_only():
+    async def test(server, address):
+        status, _, payload = await post(address, {'nodes': [('a', 'Unknown', 'A')]})
+        assert status == 422
+        error = json.loads(payload)['error']
+        assert "Node type Unknown not found" in error
+        assert "Traceback" not in error
+    serve(test)
+
+
+def test_inline_and_preloaded_templates(tmp_path):
+    template = tmp_path / "template.yml"
+    template.write_text("Box:\n  style: 'rounded=1;'\n  height: '10'\n  width: '10'\n")
+
+    async def test(server, address):
+        for name in (str(template), {'Box': {'style': 'rounded=1;', 'height': '10', 'width': '10'}}):
+            status, _, body = await post(address, {'template': name, 'nodes': [('a', 'Box', 'A')]})
+            assert status == 200, body
+    serve(test, templates=[str(template)])
+
+
+def test_overload():
+    async def test(server, address):
+        large = {'nodes': [(f'i{i}', 'EC2Instance', f'I{i}') for i in range(20000)]}
+        running = asyncio.ensure_future(server.render(large))
+        await asyncio.sleep(0)
+        status, headers, _ = await post(address, SPEC)
+        assert status == 503
+        assert headers['retry-after'] == '1'
+        assert (await running).error is None
+    serve(test, max_concurrent=1, max_queue=0)
+
+
+def test_metrics():
+    async def test(server, address):
+        await post(address, SPEC)
+        await post(address, {'nodes': [('a', 'Unknown', 'A')]})
+        status, _, body = await request(address, b"GET /metrics HTTP/1.1\r\nConnection: close\r\n\r\n")
+        metrics = json.loads(body)
+        assert status == 200
+        assert (metrics['requests'], metrics['errors'], metrics['rejected'], metrics['in_flight'], metrics['queued']) == (2, 1, 0, 0, 0)
+        assert metrics['latency']['count'] == 2
+        assert metrics['latency']['p50'] <= metrics['latency']['p99'] <= metrics['latency']['max']
+    serve(test)
+
+
+def test_http_1_0_closes_by_default():
+    async def test(server, address):
+        status, headers, body = await request(address, b"GET /health HTTP/1.0\r\n\r\n")
+        assert (status, headers['connection'], body) == (200, 'close', b"ok\n")
+    serve(test)
+
+
+def test_keep_alive():
+    async def test(server, address):
+        reader, writer = await asyncio.open_connection(*address[:2])
+        for version, connection in (("HTTP/1.1", ""), ("HTTP/1.0", "Connection: keep-alive\r\n")):
+            writer.write(f"GET /health {version}\r\n{connection}\r\n".encode())
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+            assert b"Connection: keep-alive" in head
+            assert await reader.readexactly(3) == b"ok\n"
+        writer.close()
+    serve(test)
+
+
+@pytest.mark.parametrize("raw", [
+    b"POST /render HTTP/1.1\r\nContent-Length: -5\r\n\r\n",
+    b"POST /render HTTP/1.1\r\nContent-Length: five\r\n\r\n",
+    b"GET /health HTTP/1.1\r\nX-Long: " + b"a" * 200000 + b"\r\n\r\n",
+    b"garbage\r\n\r\n",
+])
+def test_malformed_requests(raw):
+    async def test(server, address):
+        status, headers, _ = await request(address, raw)
+        assert status == 400
+        assert headers['connection'] == 'close'
+    serve(test)
+
+
+def test_unknown_endpoints_and_methods():
+    async def test(server, address):
+        assert (await request(address, b"GET /nowhere HTTP/1.0\r\n\r\n"))[0] == 404
+        assert (await request(address, b"GET /render HTTP/1.0\r\n\r\n"))[0] == 405
+        assert (await post(address, SPEC, "/metrics"))[0] == 405
+    serve(test)
+
+
+def test_worker_processes():
+    async def run():
+        server = RenderServer(workers=1)
+        address = await server.start(port=0)
+        try:
+            statuses = await asyncio.gather(*[post(address, SPEC) for _ in range(4)])
+        finally:
+            await server.close()
+        assert [status for status, _, _ in statuses] == [200] * 4
+    asyncio.run(run())
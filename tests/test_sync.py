@@ -0,0 +1,142 @@
+import pytest
+
+from py2drawio import BatchError
+from py2drawio.diagram import ROOT_ID
+
+
+@pytest.fixture
+def diagram(backend):
+    diagram = backend()
+    diagram.sync(
+        [('vpc', 'VPC', 'VPC'), ('subnet', 'PrivateSubnet', 'Subnet', None, None, 0, 'vpc')]
+        + [(f'i{i}', 'EC2Instance', f'I{i}', None, None, 2, 'subnet') for i in range(3)],
+        [('i0', 'i1'), ('i1', 'i2', 'http')],
+    )
+    return diagram
+
+
+def state(diagram, node_id):
+    node = diagram.get(node_id)
+    geometry = diagram._geometry(node)
+    return node.get('label'), node.get('layer'), diagram._parent_id(node), diagram._position(geometry), diagram._size(geometry)
+
+
+def test_rename_keeps_parent_layer_and_geometry(diagram):
+    before = state(diagram, 'i1')
+    node = diagram.upsert_node('i1', 'EC2Instance', 'renamed')
+    assert node is diagram.get('i1')
+    assert state(diagram, 'i1') == ('renamed',) + before[1:]
+    assert diagram.page.stale == set()
+
+
+def test_sync_rename_only_updates_the_renamed_node(diagram):
+    result = diagram.sync([('i0', 'EC2Instance', 'I0'), ('i1', 'EC2Instance', 'renamed')], compose=False)
+    assert result == ([], ['i1'], [])
+    assert diagram._parent_id(diagram.get('i1')) == 'subnet'
+    assert diagram.page.stale == set()
+
+
+def test_move_to_root(diagram):
+    diagram.upsert_node('i1', 'EC2Instance', 'I1', parent=ROOT_ID)
+    assert diagram._parent_id(diagram.get('i1')) == ROOT_ID
+    assert diagram.page.stale == {'subnet', ROOT_ID}
+    assert [node.get('id') for node in diagram.page.children['subnet']] == ['i0', 'i2']
+
+
+def test_resize_and_relayer(diagram):
+    diagram.upsert_node('i1', 'EC2Instance', 'I1', node_height=100, layer=1)
+    assert diagram._size(diagram._geometry(diagram.get('i1')))[1] == 100
+    assert diagram.get('i1').get('layer') == '1'
+    assert diagram.page.stale == {'subnet'}
+
+
+def test_new_node_defaults(diagram):
+    node = diagram.upsert_node('i9', 'EC2Instance', 'I9')
+    assert node.get('layer') == '0'
+    assert diagram._parent_id(node) == ROOT_ID
+
+
+@pytest.mark.parametrize("nodes", [
+    # a container moved below its own descendant, through a node that is not in the batch
+    [('vpc', 'VPC', 'VPC', None, None, 0, 'i0')],
+    # new nodes parenting each other
+    [('a', 'VPC', 'A', None, None, 0, 'b'), ('b', 'VPC', 'B', None, None, 0, 'a')],
+    [('subnet', 'PrivateSubnet', 'Subnet', None, None, 0, 'subnet')],
+])
+def test_parent_cycles_are_rejected(diagram, nodes):
+    before = {node_id: state(diagram, node_id) for node_id in ('vpc', 'subnet', 'i0')}
+    with pytest.raises(BatchError) as info:
+        diagram.sync(nodes)
+    assert any("Parent cycle" in error for error in info.value.errors)
+    assert {node_id: state(diagram, node_id) for node_id in before} == before
+    assert diagram.get('a') is None
+
+
+def test_every_problem_is_reported(diagram):
+    with pytest.raises(BatchError) as info:
+        diagram.sync(
+            [('x', 'Unknown', 'X'), ('y', 'EC2Instance', 'Y', None, None, 0, 'missing'), ('i0', 'EC2Instance', 'I0')],
+            [('i0', 'nowhere')],
+        )
+    assert len(info.value.errors) == 3
+    assert diagram.get('y') is None
+
+
+def test_remove_prunes_unlisted_nodes_and_edges(diagram):
+    result = diagram.sync(
+        [('vpc', 'VPC', 'VPC'), ('subnet', 'PrivateSubnet', 'Subnet'), ('i0', 'EC2Instance', 'I0'), ('i1', 'EC2Instance', 'I1')],
+        [('i0', 'i1')],
+        remove=True,
+    )
+    assert sorted(result.removed) == ['i1-i2', 'i2']
+    assert result.added == [] and result.updated == []
+    assert diagram.get('i2') is None and diagram.edges_of('i1') == diagram.edges_of('i0')
+
+
+def test_edge_labels_are_updated(diagram):
+    result = diagram.sync(edges=[('i1', 'i2', 'https'), ('i0', 'i2')])
+    assert result.added == ['i0-i2']
+    assert result.updated == ['i1-i2']
+    assert diagram.get('i1-i2').get('label') == 'https'
+
+
+def test_edges_without_a_name_keep_their_label(diagram):
+    result = diagram.sync(edges=[('i1', 'i2'), {'source': 'i0', 'target': 'i1', 'name': ''}])
+    assert result == ([], [], [])
+    assert diagram.get('i1-i2').get('label') == 'http'
+    assert diagram.get('i0-i1').get('label') == ''
+
+
+def test_hand_placed_siblings_are_not_moved(diagram):
+    diagram._move(diagram._geometry(diagram.get('i1')), 500, 500)
+    diagram.page.changed()
+    before = {node_id: state(diagram, node_id) for node_id in ('vpc', 'subnet', 'i0', 'i1', 'i2')}
+    result = diagram.sync([('i3', 'EC2Instance', 'I3', None, None, 2, 'subnet')])
+    assert result == (['i3'], [], [])
+    for node_id in ('vpc', 'i0', 'i1', 'i2'):
+        assert state(diagram, node_id)[3] == before[node_id][3]
+    # the new node is laid out below its hand-placed siblings, and its containers grow to fit
+    width, height = state(diagram, 'i1')[4]
+    x, y = state(diagram, 'i3')[3]
+    assert y >= 500 + height
+    subnet = state(diagram, 'subnet')
+    assert subnet[4][0] >= 500 + width and subnet[4][1] >= y + height
+    vpc = state(diagram, 'vpc')
+    assert vpc[4][0] >= subnet[3][0] + subnet[4][0] and vpc[4][1] >= subnet[3][1] + subnet[4][1]
+    assert diagram.page.stale == set() and diagram.page.unplaced == set()
+
+
+def test_new_containers_are_composed(diagram, backend):
+    subnet = state(diagram, 'subnet')
+    diagram.sync([('other', 'PrivateSubnet', 'Other', None, None, 0, 'vpc')] + [(f'o{i}', 'EC2Instance', f'O{i}', None, None, 2, 'other') for i in range(4)])
+    assert state(diagram, 'subnet')[3:] == subnet[3:]
+    # a container with only new children is composed as by compose_children
+    expected = backend()
+    other = expected.add_node('other', 'PrivateSubnet', 'Other')
+    for i in range(4):
+        expected.add_node(f'o{i}', 'EC2Instance', f'O{i}', layer=2, parent=other)
+    expected.compose_children(other)
+    for node_id in ('o0', 'o1', 'o2', 'o3'):
+        assert state(diagram, node_id)[3:] == state(expected, node_id)[3:]
+    assert state(diagram, 'other')[4] == state(expected, 'other')[4]
+    assert state(diagram, 'other')[3][1] >= subnet[3][1] + subnet[4][1]
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from py2drawio import Diagram
+from py2drawio.templates import invalidate_cache, load_template
+
+
+@pytest.fixture(autouse=True)
+def parsed_templates():
+    invalidate_cache()
+    yield
+    invalidate_cache()
+
+
+def test_diagrams_do_not_share_node_types():
+    first = Diagram()
+    first.nodetypes['Custom'] = {'style': 'rounded=1;', 'height': 10, 'width': 10}
+    first.nodetypes['VPC']['width'] = '999'
+    second = Diagram()
+    assert 'Custom' not in second.nodetypes
+    assert second.nodetypes['VPC']['width'] != '999'
+
+
+def test_loaded_template_is_read_only():
+    nodetypes = load_template()
+    with pytest.raises(TypeError):
+        nodetypes['Custom'] = {}
+    with pytest.raises(TypeError):
+        nodetypes['VPC']['width'] = '999'
+    assert Diagram(template=nodetypes).nodetypes['VPC'] == dict(nodetypes['VPC'])
+
+
+@pytest.mark.parametrize("template", [
+    "Dated:\n  style: 'rounded=1;'\n  height: 10\n  width: 10\n  created: 2024-01-01\n",
+    "1:\n  style: 'rounded=1;'\n  height: 10\n  width: 10\n",
+])
+def test_templates_without_a_json_form_are_not_cached(tmp_path, cache, template):
+    path = tmp_path / "template.yml"
+    path.write_text(template)
+    nodetypes = Diagram(template=str(path)).nodetypes
+    assert len(nodetypes) == 1
+    files = [name for _, _, names in os.walk(cache) for name in names]
+    assert files == []
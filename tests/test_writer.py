@@ -0,0 +1,93 @@
+import gzip
+import xml.etree.ElementTree as ET
+import zlib
+from base64 import b64decode
+from io import BytesIO
+from urllib.parse import quote
+
+from py2drawio import Diagram
+from py2drawio.writer import _TextSink, compress_diagram, decompress_diagram
+
+# every ASCII character, markup, and characters outside ASCII and the BMP
+TEXT = "".join(map(chr, range(32, 127))) + " <a href=\"x?y=1&z=2\">'é'</a> ümlaut 中文 \U0001F600"
+
+
+def build(backend, cells=3):
+    diagram = backend()
+    vpc = diagram.add_node("vpc", "VPC", TEXT)
+    previous = None
+    for i in range(cells):
+        node = diagram.add_node(f"i{i}", "EC2Instance", f"{TEXT} {i}", parent=vpc)
+        if previous is not None:
+            diagram.add_edge(previous, node, name=TEXT)
+        previous = node
+    diagram.compose_all()
+    return diagram
+
+
+def written(diagram, **options):
+    out = BytesIO()
+    diagram.write(out, **options)
+    return out.getvalue()
+
+
+def models(data):
+    """
+    Returns the mxGraphModel XML of every page of a written file, decompressing compressed pages
+    """
+    xml = []
+    for page in ET.fromstring(data).findall("diagram"):
+        if len(page) == 0:
+            xml.append(decompress_diagram(page.text))
+            continue
+        page[0].tail = None
+        xml.append(ET.tostring(page[0], encoding="unicode"))
+    return xml
+
+
+def test_plain_output_matches_elementtree():
+    diagram = build(Diagram)
+    expected = BytesIO()
+    ET.ElementTree(diagram.root).write(expected, encoding="us-ascii")
+    assert written(diagram) == expected.getvalue()
+
+
+def test_backends_write_the_same_bytes(backend):
+    assert written(build(backend)) == written(build(Diagram))
+    assert written(build(backend), compressed=True) == written(build(Diagram), compressed=True)
+
+
+def test_write_to_filename_and_file_like(backend, tmp_path):
+    diagram = build(backend)
+    path = tmp_path / "diagram.drawio"
+    diagram.write(str(path))
+    assert path.read_bytes() == written(diagram)
+
+
+def test_gzip(backend):
+    diagram = build(backend)
+    assert gzip.decompress(written(diagram, gzip=True)) == written(diagram)
+    assert gzip.decompress(written(diagram, compressed=True, gzip=True)) == written(diagram, compressed=True)
+
+
+def test_compressed_pages_round_trip(backend):
+    # large enough for the compressed payload to be streamed in several chunks
+    diagram = build(backend, cells=_TextSink.chunk_size // len(TEXT) * 2)
+    plain = written(diagram)
+    compressed = written(diagram, compressed=True)
+    assert ET.fromstring(compressed).get("compressed") == "true"
+    assert models(compressed) == models(plain)
+
+
+def test_compress_diagram_round_trip():
+    xml = models(written(build(Diagram)))[0]
+    for text in (xml, TEXT, "%25%", ""):
+        assert decompress_diagram(compress_diagram(text)) == text
+
+
+def test_percent_encoding_matches_encode_uri_component():
+    for text in (TEXT, "%41%", "~!*'()-_."):
+        payload = compress_diagram(text)
+        encoded = zlib.decompress(b64decode(payload), wbits=-15).decode("ascii")
+        # the characters left alone by encodeURIComponent
+        assert encoded == quote(text, safe="-_.!~*'()")